@@ -0,0 +1,18 @@
+from .backends import (
+    BACKENDS,
+    Backend,
+    FileBackend,
+    MinioFileBackend,
+    PolarsBackend,
+    PostgresBackend,
+)
+from .harness import (
+    DEFAULT_CASES,
+    RESULT_FIELDS,
+    read_results,
+    run_benchmark,
+    run_case,
+    summarize,
+    write_results,
+)
+from .cli import main
@@ -0,0 +1,271 @@
+import importlib.util
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from feast import FeatureStore
+
+# The root of the repository, which holds one directory per feature repo.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(path: str, name: str):
+    """Imports a module from a file under a unique name.
+
+    Each feature repo has its own `utils.py`, so they are loaded by path
+    instead of through `sys.path` to keep them from shadowing each other.
+
+    :param path: The path of the module, relative to the repository root.
+    :param name: The name to register the module under.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class Backend:
+    """
+    One way of serving `get_historical_features`, set up on a feature repo.
+
+    `prepare` writes the data and definitions of a (columns, rows) case,
+    `read` performs the timed retrieval and `drop_caches` discards every
+    cache the next `read` could benefit from, so it is measured cold.
+    """
+
+    name = ""
+    repo_path = ""
+
+    def __init__(self):
+        self.repo_path = os.path.join(REPO_ROOT, self.repo_path)
+        self.store = None
+        self.entity_df = None
+        self.feature_refs = []
+
+    def prepare(self, num_columns: int, num_rows: int) -> dict:
+        """Writes the data and definitions of a case.
+
+        :return: The time in ms it took, and the size of the data in bytes if
+            the backend knows it.
+        """
+        raise NotImplementedError
+
+    def read(self):
+        return self.store.get_historical_features(
+            entity_df=self.entity_df, features=self.feature_refs
+        ).to_df()
+
+    def drop_caches(self):
+        # A new FeatureStore, without the shared registry snapshot, reloads
+        # the registry and reconnects.
+        self.store = FeatureStore(repo_path=self.repo_path)
+
+
+class FileBackend(Backend):
+    """Feast's file offline store reading a local parquet file."""
+
+    name = "file"
+    repo_path = "parquet/feature_repo"
+
+    def __init__(self):
+        super().__init__()
+        self.module = load_module(
+            "parquet/feature_repo/test_parquet_performance.py", "parquet_performance"
+        )
+
+    def prepare(self, num_columns: int, num_rows: int) -> dict:
+        parquet_file = os.path.join(self.repo_path, "outfile.parquet")
+        write_ms, size_bytes, timestamps = self.module.raw_parquet_write_test(
+            parquet_file, num_columns, num_rows
+        )
+        self.store = self.module.get_feature_store(repo_path=self.repo_path)
+        self.module.apply_definitions(
+            self.store,
+            self.module.generate_feast_repository_definitions(
+                num_columns, parquet_file
+            ),
+        )
+        self.entity_df = pd.DataFrame(
+            {"id": list(range(num_rows)), "event_timestamp": timestamps}
+        )
+        self.feature_refs = [f"dummy_stats:{i}" for i in range(1, num_columns + 1)]
+        return {"prepare_ms": write_ms, "size_bytes": size_bytes}
+
+
+class MinioFileBackend(Backend):
+    """Feast's file offline store reading a parquet object from MinIO."""
+
+    name = "minio"
+    repo_path = "parquet_minio"
+    bucket_name = "my-bucket"
+
+    def __init__(self, writer_profile: str = "default"):
+        super().__init__()
+        self.writer_profile = writer_profile
+        self.utils = load_module(f"{self.repo_path}/utils.py", f"{self.name}_utils")
+
+    def entity_frame(self, num_rows: int):
+        return pd.DataFrame(
+            {
+                "id": list(range(1, num_rows + 1)),
+                "event_timestamp": [
+                    datetime.now() - timedelta(days=i) for i in range(num_rows)
+                ],
+            }
+        )
+
+    def prepare(self, num_columns: int, num_rows: int) -> dict:
+        self.store = self.utils.get_feature_store(self.repo_path)
+        s3_filepath = f"test_data_{num_columns}_{num_rows}.parquet"
+        write_report = self.utils.create_parquet_file(
+            num_columns,
+            num_rows,
+            self.bucket_name,
+            self.store.config,
+            s3_filepath,
+            self.writer_profile,
+        )
+        self.utils.apply_definitions(
+            self.store,
+            self.utils.generate_feast_repository_definitions(
+                num_columns, f"s3://{self.bucket_name}/{s3_filepath}"
+            ),
+        )
+        self.entity_df = self.entity_frame(num_rows)
+        self.feature_refs = [
+            f"dummy_feature_view:feature_{i}" for i in range(1, num_columns + 1)
+        ]
+        return {
+            "prepare_ms": write_report["write_ms"],
+            "size_bytes": write_report["size_bytes"],
+            "writer_profile": write_report["profile"],
+            "read_ms": write_report["read_ms"],
+        }
+
+    def drop_caches(self):
+        import s3fs
+
+        s3fs.S3FileSystem.clear_instance_cache()
+        super().drop_caches()
+
+
+class PolarsBackend(MinioFileBackend):
+    """The Polars offline store reading a parquet object from MinIO."""
+
+    name = "polars"
+    repo_path = "polarsstore"
+
+    def __init__(self, writer_profile: str = "default"):
+        super().__init__(writer_profile)
+        # Feast imports the offline store by its module name
+        if self.repo_path not in sys.path:
+            sys.path.insert(0, self.repo_path)
+
+    def entity_frame(self, num_rows: int):
+        import polars as pl
+
+        return pl.DataFrame(
+            {
+                "id": list(range(1, num_rows + 1)),
+                "event_timestamp": [
+                    datetime.now() - timedelta(days=i) for i in range(num_rows)
+                ],
+            }
+        )
+
+    def drop_caches(self):
+        import polarsofflinestore
+        import s3_registry
+
+        polarsofflinestore._metadata_cache.clear()
+        for disk_cache in polarsofflinestore._disk_caches.values():
+            disk_cache.clear()
+        s3_registry.clear_s3_filesystems()
+        super().drop_caches()
+
+
+class PostgresBackend(Backend):
+    """Feast's PostgreSQL offline store reading a wide table, laid out as
+    one REAL column per feature or, for wider cases, as the "groups" or
+    "array" layout of generate_data.py.  `fs_yaml_file` names another
+    configuration in the feature repo, such as feature_store_pooled.yaml."""
+
+    name = "postgres"
+    repo_path = "simple/feature_repo"
+
+    def __init__(self, layout: str = "columns", fs_yaml_file: Optional[str] = None):
+        super().__init__()
+        self.layout = layout
+        self.fs_yaml_file = fs_yaml_file
+        self.generate_data = load_module(
+            f"{self.repo_path}/generate_data.py", "postgres_generate_data"
+        )
+        self.setup_featurestore = load_module(
+            f"{self.repo_path}/setup_featurestore.py", "postgres_setup_featurestore"
+        )
+
+    def feature_store(self) -> FeatureStore:
+        if self.fs_yaml_file is None:
+            return FeatureStore(repo_path=self.repo_path)
+        return FeatureStore(
+            repo_path=self.repo_path,
+            fs_yaml_file=Path(self.repo_path, self.fs_yaml_file),
+        )
+
+    def read(self):
+        return self.setup_featurestore.get_historical_features_df(
+            self.store, self.entity_df, self.feature_refs
+        )
+
+    def drop_caches(self):
+        self.store = self.feature_store()
+
+    def prepare(self, num_columns: int, num_rows: int) -> dict:
+        self.store = self.feature_store()
+        offline_store = self.store.config.offline_store
+        db_params = {
+            "dbname": offline_store.database,
+            "user": offline_store.user,
+            "password": offline_store.password,
+            "host": offline_store.host,
+            "port": offline_store.port,
+        }
+        table_name = f"benchmark_{num_columns}_{num_rows}"
+
+        begin = time.perf_counter_ns()
+        data_size_mb, df = self.generate_data.generate_data(
+            db_params, table_name, num_rows, num_columns, layout=self.layout
+        )
+        self.setup_featurestore.setup_feature_store(
+            table_name=table_name,
+            num_features=num_columns,
+            repo_path=self.repo_path,
+            layout=self.layout,
+            fs_yaml_file=self.fs_yaml_file,
+        )
+        end = time.perf_counter_ns()
+
+        self.store = self.feature_store()
+        self.entity_df = df[["event_timestamp"]].assign(
+            example_id=range(1, num_rows + 1)
+        )
+        self.feature_refs = self.setup_featurestore.feature_refs(
+            num_columns, self.layout
+        )
+        return {
+            "prepare_ms": (end - begin) / 1e6,
+            "size_bytes": int(data_size_mb * 1024 * 1024),
+        }
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (FileBackend, MinioFileBackend, PolarsBackend, PostgresBackend)
+}
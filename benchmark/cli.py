@@ -0,0 +1,123 @@
+import argparse
+from typing import List, Optional
+
+from .backends import BACKENDS
+from .harness import DEFAULT_CASES, run_benchmark, write_results
+
+
+def parse_cases(value: str):
+    """Parses cases written as `COLUMNSxROWS[,COLUMNSxROWS...]`."""
+    cases = []
+    for case in value.split(","):
+        num_columns, _, num_rows = case.partition("x")
+        cases.append((int(num_columns), int(num_rows)))
+    return cases
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the benchmark from the command line.
+
+    Example: `python -m benchmark --backend polars --backend minio
+    --cases 10x1000,1000x1000 --trials 20`
+    """
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Measure get_historical_features across offline stores.",
+    )
+    parser.add_argument(
+        "--backend",
+        action="append",
+        choices=sorted(BACKENDS),
+        help="A backend to measure; may be repeated. Defaults to all of them.",
+    )
+    parser.add_argument(
+        "--cases",
+        type=parse_cases,
+        default=DEFAULT_CASES,
+        help="Comma separated COLUMNSxROWS cases, e.g. 10x1000,100x1000.",
+    )
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument(
+        "--phase",
+        action="append",
+        choices=["cold", "warm"],
+        help="A phase to run; may be repeated. Defaults to both.",
+    )
+    parser.add_argument(
+        "--writer-profile",
+        default="default",
+        help="The create_parquet_file writer profile of the MinIO backends.",
+    )
+    parser.add_argument(
+        "--postgres-layout",
+        choices=["columns", "groups", "array"],
+        default="columns",
+        help="The table layout of the postgres backend; groups or array for "
+        "cases wider than a Postgres row allows.",
+    )
+    parser.add_argument(
+        "--postgres-pooled",
+        action="store_true",
+        help="Connect the postgres backend through the pgbouncer on port 6432 "
+        "with feature_store_pooled.yaml.",
+    )
+    parser.add_argument(
+        "--local-pgbouncer",
+        action="store_true",
+        help="Serve port 6432 from an in-process pgbouncer stand-in.",
+    )
+    parser.add_argument("--pgbouncer-pool-size", type=int, default=20)
+    parser.add_argument(
+        "--local-s3",
+        action="store_true",
+        help="Serve MinIO's endpoint from an in-process S3 stand-in.",
+    )
+    parser.add_argument("--s3-latency-ms", type=float, default=0.0)
+    parser.add_argument("--s3-connect-latency-ms", type=float, default=0.0)
+    parser.add_argument("--s3-bandwidth-mbps", type=float, default=None)
+    parser.add_argument("--csv", default="benchmark_results.csv")
+    parser.add_argument("--json", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    if args.local_s3:
+        from .local_s3 import LocalS3Server
+
+        # Started before the backends are created, as they load feature repo
+        # modules that read the endpoint on import
+        LocalS3Server(
+            latency_ms=args.s3_latency_ms,
+            connect_latency_ms=args.s3_connect_latency_ms,
+            bandwidth_mbps=args.s3_bandwidth_mbps,
+        ).start()
+
+    if args.local_pgbouncer:
+        from .local_pgbouncer import LocalPgBouncer
+
+        LocalPgBouncer(pool_size=args.pgbouncer_pool_size).start()
+
+    backends = []
+    for name in args.backend or sorted(BACKENDS):
+        if name in ("minio", "polars"):
+            backends.append(BACKENDS[name](writer_profile=args.writer_profile))
+        elif name == "postgres":
+            backends.append(
+                BACKENDS[name](
+                    layout=args.postgres_layout,
+                    fs_yaml_file=(
+                        "feature_store_pooled.yaml" if args.postgres_pooled else None
+                    ),
+                )
+            )
+        else:
+            backends.append(BACKENDS[name]())
+
+    results = run_benchmark(
+        backends,
+        cases=args.cases,
+        warmup=args.warmup,
+        trials=args.trials,
+        phases=args.phase or ["cold", "warm"],
+    )
+    write_results(results, csv_outfile=args.csv, json_outfile=args.json)
+    print(f"Wrote {len(results)} results to {args.csv} and {args.json}")
@@ -0,0 +1,269 @@
+import csv
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (num_columns, num_rows) pairs every backend is measured on by default.
+DEFAULT_CASES = [
+    (num_columns, num_rows)
+    for num_columns in (10, 100, 1000, 10000)
+    for num_rows in (10, 100, 1000, 10000)
+]
+
+# The columns of every result, in both the CSV and the JSON output.
+RESULT_FIELDS = [
+    "run_id",
+    "backend",
+    "num_columns",
+    "num_rows",
+    "phase",
+    "warmup",
+    "trials",
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "mean_ms",
+    "stdev_ms",
+    "min_ms",
+    "max_ms",
+    "prepare_ms",
+    "size_bytes",
+    "writer_profile",
+    "read_ms",
+    "host",
+    "samples_ms",
+]
+
+
+def nanoseconds_to_milliseconds(time_ns):
+    """Converts a time value in nanoseconds to milliseconds.
+
+    :param time_ns: A numeric time value in nanoseconds.
+
+    :return time_ms: `time_ns` converted to milliseconds.
+    """
+    return time_ns / 1e6
+
+
+def summarize(samples_ms: Sequence[float]) -> Dict[str, float]:
+    """Summarizes the latencies of repeated trials.
+
+    :param samples_ms: The latency of every trial in milliseconds.
+
+    :return summary: The p50, p95 and p99 latency, the mean, standard
+        deviation, minimum and maximum, all in milliseconds.
+    """
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": statistics.fmean(samples_ms),
+        "stdev_ms": statistics.stdev(samples_ms) if len(samples_ms) > 1 else 0.0,
+        "min_ms": min(samples_ms),
+        "max_ms": max(samples_ms),
+    }
+
+
+def time_trials(backend, trials: int, drop_caches: bool) -> List[float]:
+    """Times `backend.read` repeatedly.
+
+    :param backend: A prepared `Backend`.
+    :param trials: The number of timed reads.
+    :param drop_caches: Drop the backend's caches before every read, so each
+        one is measured cold.
+
+    :return samples_ms: The latency of every read in milliseconds.
+    """
+    samples_ms = []
+    for _ in range(trials):
+        if drop_caches:
+            backend.drop_caches()
+        begin = time.perf_counter_ns()
+        backend.read()
+        end = time.perf_counter_ns()
+        samples_ms.append(nanoseconds_to_milliseconds(end - begin))
+    return samples_ms
+
+
+def run_case(
+    backend,
+    num_columns: int,
+    num_rows: int,
+    warmup: int = 2,
+    trials: int = 10,
+    phases: Sequence[str] = ("cold", "warm"),
+    run_id: Optional[str] = None,
+) -> List[Dict]:
+    """Measures one (columns, rows) case of a backend.
+
+    The cold phase drops the backend's caches before each trial.  The warm
+    phase first runs `warmup` untimed reads and then times `trials` reads
+    with every cache left in place.
+
+    :param backend: The `Backend` to measure.
+    :param num_columns: The number of feature columns.
+    :param num_rows: The number of rows, which is also the entity count.
+    :param warmup: The number of untimed reads before the warm phase.
+    :param trials: The number of timed reads in each phase.
+    :param phases: The phases to run, "cold" and/or "warm".
+    :param run_id: Identifies the benchmark run the results belong to.
+
+    :return results: One result per phase, with the RESULT_FIELDS keys.
+    """
+    prepared = backend.prepare(num_columns, num_rows) or {}
+
+    results = []
+    for phase in phases:
+        if phase == "warm":
+            for _ in range(warmup):
+                backend.read()
+        samples_ms = time_trials(backend, trials, drop_caches=phase == "cold")
+        results.append(
+            {
+                "run_id": run_id or new_run_id(),
+                "backend": backend.name,
+                "num_columns": num_columns,
+                "num_rows": num_rows,
+                "phase": phase,
+                "warmup": warmup if phase == "warm" else 0,
+                "trials": trials,
+                **summarize(samples_ms),
+                "prepare_ms": prepared.get("prepare_ms"),
+                "size_bytes": prepared.get("size_bytes"),
+                "writer_profile": prepared.get("writer_profile"),
+                "read_ms": prepared.get("read_ms"),
+                "host": platform.node(),
+                "samples_ms": samples_ms,
+            }
+        )
+    return results
+
+
+def run_benchmark(
+    backends,
+    cases: Sequence[Tuple[int, int]] = DEFAULT_CASES,
+    warmup: int = 2,
+    trials: int = 10,
+    phases: Sequence[str] = ("cold", "warm"),
+) -> List[Dict]:
+    """Measures every case of every backend.
+
+    A case that fails, e.g. because the backend cannot hold that many
+    columns, is reported and skipped rather than ending the run.
+
+    :param backends: The `Backend`s to measure.
+    :param cases: The (num_columns, num_rows) pairs to measure.
+    :param warmup: The number of untimed reads before the warm phase.
+    :param trials: The number of timed reads in each phase.
+    :param phases: The phases to run, "cold" and/or "warm".
+
+    :return results: Every result, with the RESULT_FIELDS keys.
+    """
+    run_id = new_run_id()
+    results = []
+    for backend in backends:
+        for num_columns, num_rows in cases:
+            print(f"Running {backend.name} (cols: {num_columns}, rows: {num_rows})")
+            try:
+                case_results = run_case(
+                    backend, num_columns, num_rows, warmup, trials, phases, run_id
+                )
+            except Exception as e:
+                print(f"{backend.name} failed on {num_columns}x{num_rows}: {e}")
+                continue
+            for result in case_results:
+                print(
+                    f"  {result['phase']}: p50 {result['p50_ms']:.1f} ms, "
+                    f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms"
+                )
+            results.extend(case_results)
+    return results
+
+
+def new_run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def write_results(
+    results: List[Dict],
+    csv_outfile: Optional[str] = None,
+    json_outfile: Optional[str] = None,
+):
+    """Appends results to a CSV and/or a JSON file, creating them if needed.
+
+    Both files hold the RESULT_FIELDS columns, so runs of different backends
+    and commits can be collected in one place and compared.  In the CSV the
+    individual samples are joined with spaces.
+
+    :param results: The results to write.
+    :param csv_outfile: The CSV file to append to, if any.
+    :param json_outfile: The JSON file, holding a list of results, to extend.
+    """
+    if csv_outfile:
+        new_file = not os.path.exists(csv_outfile)
+        if not new_file:
+            with open(csv_outfile, newline="") as csvfile:
+                header = next(csv.reader(csvfile), None)
+            if header and header != RESULT_FIELDS:
+                raise ValueError(
+                    f"{csv_outfile} was written with other columns; "
+                    "write the results to a new file"
+                )
+        with open(csv_outfile, "a", newline="\n") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS)
+            if new_file:
+                writer.writeheader()
+            for result in results:
+                writer.writerow(
+                    {
+                        **result,
+                        "samples_ms": " ".join(
+                            f"{sample:.3f}" for sample in result["samples_ms"]
+                        ),
+                    }
+                )
+
+    if json_outfile:
+        existing = []
+        if os.path.exists(json_outfile):
+            with open(json_outfile) as f:
+                existing = json.load(f)
+        with open(json_outfile, "w") as f:
+            json.dump(existing + list(results), f, indent=2)
+
+
+def read_results(path: str) -> List[Dict]:
+    """Reads results written by `write_results` from a CSV or JSON file.
+
+    :param path: A .csv or .json results file.
+
+    :return results: The results, with numeric fields parsed.
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+
+    results = []
+    with open(path, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            for field in ("num_columns", "num_rows", "warmup", "trials"):
+                row[field] = int(row[field])
+            # Files written before a field was added do not have it
+            for field in RESULT_FIELDS:
+                row[field] = row.get(field) or None
+            for field in RESULT_FIELDS:
+                if field.endswith("_ms") and field != "samples_ms" and row[field]:
+                    row[field] = float(row[field])
+            row["size_bytes"] = int(row["size_bytes"]) if row["size_bytes"] else None
+            row["samples_ms"] = [
+                float(sample) for sample in (row["samples_ms"] or "").split()
+            ]
+            results.append(row)
+    return results
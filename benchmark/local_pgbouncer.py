@@ -0,0 +1,730 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import struct
+import threading
+from collections import OrderedDict, defaultdict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# Request codes a client may send in place of a startup message.
+CANCEL_REQUEST = 80877102
+SSL_REQUEST = 80877103
+GSSENC_REQUEST = 80877104
+
+# Authentication requests the stand-in answers when it opens a server
+# connection.
+AUTH_OK = 0
+AUTH_CLEARTEXT = 3
+AUTH_MD5 = 5
+AUTH_SASL = 10
+AUTH_SASL_CONTINUE = 11
+AUTH_SASL_FINAL = 12
+
+AUTHENTICATION_OK = b"R" + struct.pack("!ii", 8, 0)
+PARSE_COMPLETE = b"1" + struct.pack("!i", 4)
+CLOSE_COMPLETE = b"3" + struct.pack("!i", 4)
+
+# The server messages that complete the response to each client message.
+# Flush, CopyData, CopyDone and CopyFail have no response of their own.
+RESPONSE_ENDS = {
+    b"P": b"1",  # Parse: ParseComplete
+    b"B": b"2",  # Bind: BindComplete
+    b"D": b"Tn",  # Describe: RowDescription or NoData
+    b"E": b"CIs",  # Execute: CommandComplete, EmptyQuery or PortalSuspended
+    b"C": b"3",  # Close: CloseComplete
+    b"S": b"Z",  # Sync: ReadyForQuery
+    b"Q": b"Z",  # Query: ReadyForQuery
+    b"F": b"Z",  # FunctionCall: ReadyForQuery
+}
+
+# Simple queries that deallocate the client's prepared statements, which are
+# answered by the stand-in rather than dropping the server's shared ones.
+DEALLOCATE = re.compile(
+    rb'\s*DEALLOCATE\s+(?:PREPARE\s+)?(?:(ALL)|"?([^\s";]+)"?)\s*;?\s*',
+    re.IGNORECASE,
+)
+DISCARD_ALL = re.compile(rb"\s*DISCARD\s+ALL\s*;?\s*", re.IGNORECASE)
+
+# Server messages that may arrive at any time: notices, notifications and
+# parameter changes.
+ASYNC_MESSAGES = (b"N", b"A", b"S")
+
+
+def _message(kind: bytes, payload: bytes) -> bytes:
+    return kind + struct.pack("!i", len(payload) + 4) + payload
+
+
+def _error(code: str, text: str) -> bytes:
+    fields = b"".join(
+        key + value.encode() + b"\0"
+        for key, value in ((b"S", "FATAL"), (b"V", "FATAL"), (b"C", code), (b"M", text))
+    )
+    return _message(b"E", fields + b"\0")
+
+
+def _cstring(data: bytes, start: int) -> Tuple[bytes, int]:
+    """Reads a null-terminated string, returning it and the offset after it."""
+    end = data.index(b"\0", start)
+    return data[start:end], end + 1
+
+
+def _startup_parameters(startup: bytes) -> Dict[str, str]:
+    """The parameters of a startup message, such as user and database."""
+    fields = startup[8:].split(b"\0")
+    return {
+        key.decode(): value.decode() for key, value in zip(fields[::2], fields[1::2])
+    }
+
+
+def _statement_name(parse: bytes) -> bytes:
+    """The name a statement is prepared under on the server: the same for
+    every client that prepares the same query with the same parameter
+    types, so they can share it."""
+    return b"pgb_" + hashlib.sha256(parse).hexdigest()[:32].encode()
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+    """Reads one typed protocol message, returning its type and the whole
+    message including the header."""
+    header = await reader.readexactly(5)
+    (length,) = struct.unpack("!i", header[1:])
+    return header[:1], header + await reader.readexactly(length - 4)
+
+
+class _ServerError(Exception):
+    """Postgres refused a new server connection; carries its ErrorResponse."""
+
+    def __init__(self, message: bytes):
+        super().__init__(message)
+        self.message = message
+
+
+class _ServerConnection:
+    """
+    An authenticated connection to Postgres, with the ParameterStatus
+    messages that followed its AuthenticationOk, which are replayed to every
+    client logging in with the same startup parameters, and the statements
+    prepared on it, least recently used first.
+    """
+
+    def __init__(self, key: bytes, reader, writer, parameters: bytes, cancel_key):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.parameters = parameters
+        self.cancel_key = cancel_key
+        self.prepared: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def close(self):
+        self.writer.close()
+
+
+class _Expected:
+    """
+    A response a client is owed, in the order its messages were sent.
+    Either the server's response, ending at one of the message types in
+    `ends` and only passed on to the client if `forward`, or a `reply` the
+    stand-in gives itself once every earlier response has been passed on.
+    """
+
+    def __init__(
+        self,
+        ends: bytes = b"",
+        forward: bool = True,
+        statement: Optional[bytes] = None,
+        reply: Optional[bytes] = None,
+    ):
+        self.ends = ends
+        self.forward = forward
+        # The server statement name a Parse prepares, forgotten if it fails
+        self.statement = statement
+        self.reply = reply
+
+
+class _ClientSession:
+    """A logged in client, the statements it has prepared by name and the
+    server connection it is currently assigned, if any."""
+
+    def __init__(self, startup: bytes, reader, writer):
+        self.startup = startup
+        # Connections are only shared between identical startup parameters
+        self.key = startup[8:]
+        self.reader = reader
+        self.writer = writer
+        self.cancel_key = secrets.token_bytes(8)
+        self.statements: Dict[bytes, bytes] = {}
+        self.server: Optional[_ServerConnection] = None
+        self.relay: Optional[asyncio.Future] = None
+        self.expected: Deque[_Expected] = deque()
+        self.status = b"I"
+
+
+class LocalPgBouncer:
+    """
+    A local stand-in for pgbouncer, so the pooled Postgres configuration can
+    be exercised without deploying one.
+
+    Clients connect to it as if it were Postgres.  With the default
+    `pool_mode="transaction"`, a client is only assigned a server connection
+    while it runs a transaction (or a single statement outside one), so
+    clients holding idle connections open, such as connection pools, do not
+    pin Postgres backends.  With `pool_mode="session"` a client keeps its
+    server connection until it disconnects, when the connection is reset
+    with `reset_query`.  Server connections are shared between clients with
+    the same startup parameters (user, database, options) and kept open
+    between them.  At most `pool_size` are in use at once; further clients
+    wait up to `wait_timeout` seconds for one.
+
+    As with pgbouncer's `max_prepared_statements`, statements clients
+    prepare by name are prepared on whichever server connection runs them,
+    under a name shared by every client preparing the same query, and up to
+    `max_prepared_statements` of them are kept on each connection; a
+    client's DEALLOCATE only forgets its own names for them.  As in
+    transaction pooling generally, session state such as SET, temporary
+    tables, SQL-level PREPARE and advisory locks does not outlast a
+    transaction.
+
+    Like pgbouncer with `auth_type = trust`, clients are not asked for a
+    password; the stand-in logs in to Postgres itself with `password`, so
+    only listen on addresses that trusted clients can reach.  TLS is not
+    supported.
+
+    :param upstream_host: The Postgres host.
+    :param upstream_port: The Postgres port.
+    :param port: The port to listen on.  pgbouncer's default, 6432, matches
+        feature_store_pooled.yaml; 0 picks a free one.
+    :param host: The address to listen on.
+    :param pool_size: The maximum number of server connections in use.
+    :param wait_timeout: How long a client waits for a free connection.
+    :param pool_mode: "transaction" or "session".
+    :param max_prepared_statements: The number of prepared statements kept
+        on each server connection.
+    :param reset_query: Run on a connection before it is reused, in session
+        mode.
+    :param password: The password for Postgres, by default the PG_PASSWORD
+        environment variable that feature_store_pooled.yaml also uses.
+    """
+
+    def __init__(
+        self,
+        upstream_host: str = "localhost",
+        upstream_port: int = 5432,
+        port: int = 6432,
+        host: str = "127.0.0.1",
+        pool_size: int = 20,
+        wait_timeout: float = 30.0,
+        pool_mode: str = "transaction",
+        max_prepared_statements: int = 200,
+        reset_query: str = "DISCARD ALL",
+        password: Optional[str] = None,
+    ):
+        if pool_mode not in ("transaction", "session"):
+            raise ValueError(f"Unsupported pool_mode {pool_mode!r}")
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.port = port
+        self.host = host
+        self.pool_size = pool_size
+        self.wait_timeout = wait_timeout
+        self.pool_mode = pool_mode
+        self.max_prepared_statements = max_prepared_statements
+        self.reset_query = reset_query
+        self.password = password if password is not None else os.getenv("PG_PASSWORD")
+        self.stats = {"clients": 0, "server_connections": 0, "reused": 0}
+        self._idle: Dict[bytes, List[_ServerConnection]] = defaultdict(list)
+        self._sessions: Dict[bytes, _ClientSession] = {}
+        self._clients: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread = None
+
+    async def _open(self):
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self._server = await asyncio.start_server(
+            self._serve_client, self.host, self.port
+        )
+        # The port actually bound, if 0 asked for any free one
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _read_startup(self, reader, writer) -> Optional[bytes]:
+        """Reads the client's startup message, declining TLS and GSS
+        encryption and passing cancel requests on to the server connection
+        the client is assigned."""
+        while True:
+            (length,) = struct.unpack("!i", await reader.readexactly(4))
+            body = await reader.readexactly(length - 4)
+            (code,) = struct.unpack("!i", body[:4])
+            if code in (SSL_REQUEST, GSSENC_REQUEST):
+                writer.write(b"N")
+                await writer.drain()
+            elif code == CANCEL_REQUEST:
+                session = self._sessions.get(body[4:12])
+                if session is not None and session.server is not None:
+                    _, upstream = await asyncio.open_connection(
+                        self.upstream_host, self.upstream_port
+                    )
+                    upstream.write(
+                        struct.pack("!ii", 16, CANCEL_REQUEST)
+                        + session.server.cancel_key
+                    )
+                    await upstream.drain()
+                    upstream.close()
+                return None
+            else:
+                return struct.pack("!i", length) + body
+
+    async def _connect(self, startup: bytes) -> _ServerConnection:
+        """Opens a server connection, authenticating with the password."""
+        server_reader, server_writer = await asyncio.open_connection(
+            self.upstream_host, self.upstream_port
+        )
+        try:
+            server_writer.write(startup)
+            await server_writer.drain()
+
+            user = _startup_parameters(startup).get("user", "")
+            password = (self.password or "").encode()
+            scram = None
+            parameters = []
+            cancel_key = b""
+            while True:
+                kind, message = await _read_message(server_reader)
+                if kind == b"E":
+                    raise _ServerError(message)
+                if kind == b"S":
+                    parameters.append(message)
+                elif kind == b"K":
+                    cancel_key = message[5:]
+                elif kind == b"Z":
+                    break
+                elif kind == b"R":
+                    (code,) = struct.unpack("!i", message[5:9])
+                    if code == AUTH_CLEARTEXT:
+                        response = password + b"\0"
+                    elif code == AUTH_MD5:
+                        inner = hashlib.md5(password + user.encode()).hexdigest()
+                        response = (
+                            b"md5"
+                            + hashlib.md5(inner.encode() + message[9:13])
+                            .hexdigest()
+                            .encode()
+                            + b"\0"
+                        )
+                    elif code == AUTH_SASL:
+                        scram = _Scram(password)
+                        first = scram.client_first()
+                        response = (
+                            b"SCRAM-SHA-256\0" + struct.pack("!i", len(first)) + first
+                        )
+                    elif code == AUTH_SASL_CONTINUE:
+                        response = scram.client_final(message[9:])
+                    elif code in (AUTH_OK, AUTH_SASL_FINAL):
+                        continue
+                    else:
+                        raise _ServerError(
+                            _error("28000", f"unsupported authentication {code}")
+                        )
+                    server_writer.write(_message(b"p", response))
+                    await server_writer.drain()
+        except BaseException:
+            server_writer.close()
+            raise
+
+        self.stats["server_connections"] += 1
+        return _ServerConnection(
+            startup[8:],
+            server_reader,
+            server_writer,
+            b"".join(parameters),
+            cancel_key,
+        )
+
+    async def _acquire(self, session: _ClientSession) -> _ServerConnection:
+        """Takes a pool slot and an idle or new server connection for the
+        session, waiting up to wait_timeout for the slot."""
+        await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        try:
+            idle = self._idle[session.key]
+            if idle:
+                self.stats["reused"] += 1
+                return idle.pop()
+            return await self._connect(session.startup)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, server: _ServerConnection, reusable: bool):
+        self._slots.release()
+        if reusable:
+            self._idle[server.key].append(server)
+        else:
+            server.close()
+
+    async def _serve_client(self, reader, writer):
+        self.stats["clients"] += 1
+        task = asyncio.current_task()
+        self._clients.add(task)
+        session = None
+        try:
+            startup = await self._read_startup(reader, writer)
+            if startup is None:
+                return
+            session = _ClientSession(startup, reader, writer)
+            self._sessions[session.cancel_key] = session
+            await self._serve_session(session)
+        except asyncio.TimeoutError:
+            writer.write(_error("53300", "no server connection available"))
+            await writer.drain()
+        except _ServerError as e:
+            writer.write(e.message)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(), which waits for the session to end
+            pass
+        finally:
+            if session is not None:
+                self._sessions.pop(session.cancel_key, None)
+            self._clients.discard(task)
+            writer.close()
+
+    async def _serve_session(self, session: _ClientSession):
+        # Log in with a server connection, so the client sees its server
+        # parameters and a bad database or user is refused straight away
+        server = await self._assign(session)
+        session.writer.write(
+            AUTHENTICATION_OK
+            + server.parameters
+            + _message(b"K", session.cancel_key)
+            + _message(b"Z", b"I")
+        )
+        if self.pool_mode == "transaction":
+            await self._unassign(session, reusable=True)
+        await session.writer.drain()
+
+        reusable = False
+        try:
+            while True:
+                try:
+                    kind, message = await _read_message(session.reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    kind = b"X"
+                if kind == b"X":
+                    reusable = True
+                    break
+                await self._send(session, kind, message)
+        finally:
+            # Only an idle connection can be handed to another client
+            reusable = (
+                reusable
+                and session.relay is not None
+                and not session.relay.done()
+                and not session.expected
+                and session.status == b"I"
+            )
+            await self._unassign(session, reusable)
+
+    async def _assign(self, session: _ClientSession) -> _ServerConnection:
+        """The session's server connection, assigning one if it has none."""
+        if session.server is None:
+            session.server = await self._acquire(session)
+            session.relay = asyncio.ensure_future(self._relay(session))
+        return session.server
+
+    async def _unassign(self, session: _ClientSession, reusable: bool):
+        """Returns the session's server connection to the pool, resetting it
+        first in session mode."""
+        server, relay = session.server, session.relay
+        if server is None:
+            return
+        session.server = session.relay = None
+        relay.cancel()
+        await asyncio.gather(relay, return_exceptions=True)
+        if reusable and self.pool_mode == "session":
+            reusable = await self._reset(server)
+        self._release(server, reusable)
+
+    async def _relay(self, session: _ClientSession):
+        """Passes the server's responses on to the client, until the server
+        connection can be returned to the pool in transaction mode."""
+        server = session.server
+        try:
+            while True:
+                kind, message = await _read_message(server.reader)
+                self._receive(session, kind, message)
+                if (
+                    self.pool_mode == "transaction"
+                    and kind == b"Z"
+                    and session.status == b"I"
+                    and not session.expected
+                ):
+                    session.server = session.relay = None
+                    self._release(server, reusable=True)
+                    return
+                await session.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The server went away, so the client's session ends with it
+            session.writer.close()
+
+    def _receive(self, session: _ClientSession, kind: bytes, message: bytes):
+        """Handles one server message, matching it to the response the
+        client expects."""
+        if kind in ASYNC_MESSAGES or not session.expected:
+            session.writer.write(message)
+            return
+        expected = session.expected[0]
+        if kind == b"E" and expected.ends != b"Z":
+            # The server discards the client's messages up to the next Sync
+            session.writer.write(message)
+            while session.expected and session.expected[0].ends != b"Z":
+                skipped = session.expected.popleft()
+                if skipped.statement is not None:
+                    session.server.prepared.pop(skipped.statement, None)
+            return
+        if expected.forward:
+            session.writer.write(message)
+        if kind in expected.ends:
+            session.expected.popleft()
+            if kind == b"Z":
+                session.status = message[5:6]
+            self._send_replies(session)
+
+    def _send_replies(self, session: _ClientSession):
+        """Sends the stand-in's own replies that are next in line."""
+        while session.expected and session.expected[0].reply is not None:
+            session.writer.write(session.expected.popleft().reply)
+
+    def _reply(self, session: _ClientSession, reply: bytes):
+        if session.expected:
+            session.expected.append(_Expected(reply=reply))
+        else:
+            session.writer.write(reply)
+
+    async def _send(self, session: _ClientSession, kind: bytes, message: bytes):
+        """Sends one client message to the session's server connection,
+        renaming the client's prepared statements to the server's."""
+        if kind == b"Q":
+            query = message[5:-1]
+            deallocate = DEALLOCATE.fullmatch(query)
+            if deallocate and (
+                deallocate.group(1) or deallocate.group(2) in session.statements
+            ):
+                if deallocate.group(1):
+                    session.statements.clear()
+                    tag = b"DEALLOCATE ALL"
+                else:
+                    del session.statements[deallocate.group(2)]
+                    tag = b"DEALLOCATE"
+                self._reply(
+                    session,
+                    _message(b"C", tag + b"\0") + _message(b"Z", session.status),
+                )
+                return
+            if DISCARD_ALL.fullmatch(query):
+                session.statements.clear()
+                server = await self._assign(session)
+                server.prepared.clear()
+        elif kind in (b"C", b"D") and message[5:6] == b"S":
+            name, _ = _cstring(message, 6)
+            if kind == b"C" and name in session.statements:
+                # Left prepared on the server for other clients
+                del session.statements[name]
+                self._reply(session, CLOSE_COMPLETE)
+                return
+            if name in session.statements:
+                server = await self._assign(session)
+                statement = self._prepare(session, server, name)
+                message = _message(b"D", b"S" + statement + b"\0")
+        elif kind == b"P":
+            name, end = _cstring(message, 5)
+            if name:
+                session.statements[name] = message[end:]
+                server = await self._assign(session)
+                statement = _statement_name(message[end:])
+                if statement in server.prepared:
+                    server.prepared.move_to_end(statement)
+                    self._reply(session, PARSE_COMPLETE)
+                    return
+                self._prepare(session, server, name, forward=True)
+                await server.writer.drain()
+                return
+        elif kind == b"B":
+            portal, end = _cstring(message, 5)
+            name, end = _cstring(message, end)
+            if name in session.statements:
+                server = await self._assign(session)
+                statement = self._prepare(session, server, name)
+                message = _message(
+                    b"B", portal + b"\0" + statement + b"\0" + message[end:]
+                )
+
+        # Nothing awaits between assigning the connection and recording the
+        # expected response, so the relay cannot release it in between
+        server = await self._assign(session)
+        if kind in RESPONSE_ENDS:
+            session.expected.append(_Expected(RESPONSE_ENDS[kind]))
+        server.writer.write(message)
+        await server.writer.drain()
+
+    def _prepare(
+        self,
+        session: _ClientSession,
+        server: _ServerConnection,
+        name: bytes,
+        forward: bool = False,
+    ) -> bytes:
+        """
+        Makes sure the session's statement `name` is prepared on `server`,
+        closing the least recently used statement if the connection already
+        holds max_prepared_statements.  The ParseComplete is only passed on
+        to the client if `forward`, i.e. the client sent the Parse.
+
+        :return: The server's name for the statement.
+        """
+        parse = session.statements[name]
+        statement = _statement_name(parse)
+        if statement in server.prepared:
+            server.prepared.move_to_end(statement)
+            return statement
+        if len(server.prepared) >= self.max_prepared_statements:
+            evicted, _ = server.prepared.popitem(last=False)
+            server.writer.write(_message(b"C", b"S" + evicted + b"\0"))
+            session.expected.append(_Expected(b"3", forward=False))
+        server.prepared[statement] = None
+        server.writer.write(_message(b"P", statement + b"\0" + parse))
+        session.expected.append(_Expected(b"1", forward=forward, statement=statement))
+        return statement
+
+    async def _reset(self, server: _ServerConnection) -> bool:
+        """Clears session state left by the last client."""
+        try:
+            server.writer.write(_message(b"Q", self.reset_query.encode() + b"\0"))
+            await server.writer.drain()
+            while True:
+                kind, message = await _read_message(server.reader)
+                if kind == b"E":
+                    return False
+                if kind == b"Z":
+                    # DISCARD ALL also deallocates every prepared statement
+                    server.prepared.clear()
+                    return message[5:6] == b"I"
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return False
+
+    async def _close(self):
+        self._server.close()
+        # Drop the sessions still open, closing their server connections
+        for task in list(self._clients):
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        await self._server.wait_closed()
+        for connections in self._idle.values():
+            for server in connections:
+                server.close()
+        self._idle.clear()
+
+    def start(self) -> "LocalPgBouncer":
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._open())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+    def __enter__(self) -> "LocalPgBouncer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Scram:
+    """The client side of a SCRAM-SHA-256 exchange, without channel binding."""
+
+    def __init__(self, password: bytes):
+        self.password = password
+        self.nonce = base64.b64encode(secrets.token_bytes(18))
+        self.first_bare = b"n=,r=" + self.nonce
+
+    def client_first(self) -> bytes:
+        return b"n,," + self.first_bare
+
+    def client_final(self, server_first: bytes) -> bytes:
+        fields = dict(item.split(b"=", 1) for item in server_first.split(b","))
+        salted = hashlib.pbkdf2_hmac(
+            "sha256", self.password, base64.b64decode(fields[b"s"]), int(fields[b"i"])
+        )
+        client_key = hmac.digest(salted, b"Client Key", "sha256")
+        final_bare = b"c=biws,r=" + fields[b"r"]
+        auth_message = self.first_bare + b"," + server_first + b"," + final_bare
+        signature = hmac.digest(
+            hashlib.sha256(client_key).digest(), auth_message, "sha256"
+        )
+        proof = bytes(a ^ b for a, b in zip(client_key, signature))
+        return final_bare + b",p=" + base64.b64encode(proof)
+
+
+def main():
+    """Serves the stand-in until interrupted, e.g.
+    `python -m benchmark.local_pgbouncer --pool-size 20`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="benchmark.local_pgbouncer",
+        description="Serve a local stand-in for pgbouncer.",
+    )
+    parser.add_argument("--upstream-host", default="localhost")
+    parser.add_argument("--upstream-port", type=int, default=5432)
+    parser.add_argument("--port", type=int, default=6432)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--wait-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--pool-mode", choices=["transaction", "session"], default="transaction"
+    )
+    parser.add_argument("--max-prepared-statements", type=int, default=200)
+    args = parser.parse_args()
+
+    pooler = LocalPgBouncer(
+        upstream_host=args.upstream_host,
+        upstream_port=args.upstream_port,
+        port=args.port,
+        host=args.host,
+        pool_size=args.pool_size,
+        wait_timeout=args.wait_timeout,
+        pool_mode=args.pool_mode,
+        max_prepared_statements=args.max_prepared_statements,
+    ).start()
+    print(
+        f"Pooling {args.upstream_host}:{args.upstream_port} "
+        f"on {args.host}:{args.port} in {args.pool_mode} mode"
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pooler.stop()
+
+
+if __name__ == "__main__":
+    main()
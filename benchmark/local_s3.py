@@ -0,0 +1,199 @@
+import argparse
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+# Responses are released in pieces of this size when bandwidth is limited,
+# so large objects arrive as a steady stream rather than one late burst.
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+
+class ThrottledApp:
+    """
+    WSGI middleware that makes a local server behave like a remote one.
+
+    Every request waits `latency_ms` before it is handled, the first request
+    on each new connection additionally waits `connect_latency_ms` (standing
+    in for the TCP and TLS handshakes a pooled client avoids), and request
+    and response bodies move at no more than `bandwidth_mbps` per request.
+    """
+
+    def __init__(
+        self,
+        app,
+        latency_ms: float = 0.0,
+        connect_latency_ms: float = 0.0,
+        bandwidth_mbps: Optional[float] = None,
+    ):
+        self.app = app
+        self.latency = latency_ms / 1000
+        self.connect_latency = connect_latency_ms / 1000
+        self.bytes_per_second = (
+            bandwidth_mbps * 1_000_000 / 8 if bandwidth_mbps else None
+        )
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        connection = (environ.get("REMOTE_ADDR"), environ.get("REMOTE_PORT"))
+        with self._lock:
+            new_connection = connection not in self._connections
+            self._connections.add(connection)
+
+        delay = self.latency + (self.connect_latency if new_connection else 0.0)
+        if self.bytes_per_second:
+            delay += int(environ.get("CONTENT_LENGTH") or 0) / self.bytes_per_second
+        if delay:
+            time.sleep(delay)
+
+        body = self.app(environ, start_response)
+        if not self.bytes_per_second:
+            return body
+        return self._throttle(body)
+
+    def _throttle(self, body: Iterable[bytes]):
+        try:
+            for data in body:
+                for start in range(0, len(data), THROTTLE_CHUNK_SIZE):
+                    chunk = data[start : start + THROTTLE_CHUNK_SIZE]
+                    time.sleep(len(chunk) / self.bytes_per_second)
+                    yield chunk
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+
+class LocalS3Server:
+    """
+    An in-process, S3-compatible stand-in for MinIO built on moto's server,
+    with configurable latency and bandwidth, so the object store paths can
+    be benchmarked reproducibly on one machine.  Requires `moto[server]`.
+
+    Starting it points FEAST_S3_ENDPOINT_URL at the stand-in and fills in
+    dummy AWS credentials if none are set.  Start it before the feature
+    repo modules are imported, as they read these variables on import.
+    Objects only live for as long as the server does.
+
+    :param port: The port to listen on.  MinIO's default, 9000, matches the
+        endpoints in the feature_store.yaml files.
+    :param host: The address to listen on.
+    :param latency_ms: The delay added to every request.
+    :param connect_latency_ms: The extra delay of the first request on each
+        new connection.
+    :param bandwidth_mbps: The per-request throughput limit in megabits per
+        second, or None for unlimited.
+    :param buckets: The buckets to create on start.
+    """
+
+    def __init__(
+        self,
+        port: int = 9000,
+        host: str = "127.0.0.1",
+        latency_ms: float = 0.0,
+        connect_latency_ms: float = 0.0,
+        bandwidth_mbps: Optional[float] = None,
+        buckets: Iterable[str] = ("my-bucket",),
+    ):
+        self.port = port
+        self.host = host
+        self.latency_ms = latency_ms
+        self.connect_latency_ms = connect_latency_ms
+        self.bandwidth_mbps = bandwidth_mbps
+        self.buckets = list(buckets)
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "LocalS3Server":
+        try:
+            from moto.server import DomainDispatcherApplication, create_backend_app
+        except ImportError as e:
+            raise ImportError(
+                "The local S3 stand-in needs moto: pip install 'moto[server]'"
+            ) from e
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietRequestHandler(WSGIRequestHandler):
+            # Keep the per-request access log out of benchmark output
+            def log_request(self, *args, **kwargs):
+                pass
+
+        os.environ["FEAST_S3_ENDPOINT_URL"] = self.endpoint_url
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+        app = ThrottledApp(
+            DomainDispatcherApplication(create_backend_app),
+            latency_ms=self.latency_ms,
+            connect_latency_ms=self.connect_latency_ms,
+            bandwidth_mbps=self.bandwidth_mbps,
+        )
+        self._server = make_server(
+            self.host,
+            self.port,
+            app,
+            threaded=True,
+            request_handler=QuietRequestHandler,
+        )
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        import boto3
+
+        s3 = boto3.client("s3", endpoint_url=self.endpoint_url)
+        for bucket in self.buckets:
+            s3.create_bucket(Bucket=bucket)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "LocalS3Server":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    """Serves the stand-in until interrupted, for scripts run separately,
+    e.g. `python -m benchmark.local_s3 --latency-ms 20 --bandwidth-mbps 200`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="benchmark.local_s3",
+        description="Serve a local S3 stand-in with injected latency.",
+    )
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=None)
+    parser.add_argument("--bucket", action="append", default=None)
+    args = parser.parse_args()
+
+    server = LocalS3Server(
+        port=args.port,
+        host=args.host,
+        latency_ms=args.latency_ms,
+        connect_latency_ms=args.connect_latency_ms,
+        bandwidth_mbps=args.bandwidth_mbps,
+        buckets=args.bucket or ["my-bucket"],
+    ).start()
+    print(f"Local S3 stand-in listening on {server.endpoint_url}")
+    print(f"export FEAST_S3_ENDPOINT_URL={server.endpoint_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+
+from feast import FeatureStore
+
+# Records which definitions were last applied to each registry, so unchanged
+# definitions are not applied again.
+APPLY_CACHE_FILE = ".apply_fingerprints.json"
+
+# In-memory registries shared by the FeatureStores of each repository path.
+_registries = {}
+
+
+def definitions_fingerprint(defs) -> str:
+    """
+    A digest of feast definitions that only changes when their specs do.
+
+    :param defs: The feast objects that would be passed to `FeatureStore.apply`.
+
+    :return: A hex digest of the definitions' protos, ignoring the
+        timestamps feast records in their metadata.
+    """
+    digest = hashlib.sha256()
+    for definition in defs:
+        proto = definition.to_proto()
+        _clear_meta(proto)
+        digest.update(type(definition).__name__.encode())
+        digest.update(proto.SerializeToString(deterministic=True))
+    return digest.hexdigest()
+
+
+def _clear_meta(proto):
+    """
+    Clears every `meta` message (created and updated timestamps) in a proto.
+    """
+    for field, value in proto.ListFields():
+        if field.message_type is None or field.message_type.GetOptions().map_entry:
+            continue
+        if field.name == "meta":
+            proto.ClearField("meta")
+        elif hasattr(value, "ListFields"):
+            _clear_meta(value)
+        else:
+            for item in value:
+                _clear_meta(item)
+
+
+def get_feature_store(repo_path: str = ".") -> FeatureStore:
+    """
+    Creates a FeatureStore that shares its in-memory registry with every other
+    FeatureStore this function returned for `repo_path`, so the registry is
+    only read from its store once per process.
+
+    :param repo_path: The feature repository path.
+
+    :return: A FeatureStore for the repository.
+    """
+    store = FeatureStore(repo_path=repo_path)
+    key = os.path.abspath(repo_path)
+    registry = _registries.get(key)
+    if registry is None:
+        _registries[key] = store.registry
+    else:
+        store._registry = registry
+    return store
+
+
+def apply_definitions(store: FeatureStore, defs) -> bool:
+    """
+    Applies feast definitions unless these exact definitions were the last
+    ones applied to the store's registry and nothing has changed it since.
+    The record of the last apply is kept in APPLY_CACHE_FILE in the feature
+    repository, so it also holds across runs.
+
+    :param store: The FeatureStore to apply the definitions to.
+    :param defs: The feast objects to apply.
+
+    :return: Whether `store.apply` was actually called.
+    """
+    fingerprint = definitions_fingerprint(defs)
+    registry_path = str(getattr(store.config.registry, "path", store.config.registry))
+    cache_path = os.path.join(store.repo_path, APPLY_CACHE_FILE)
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    if cache.get(registry_path) == {
+        "fingerprint": fingerprint,
+        "last_updated": _registry_last_updated(store),
+    }:
+        return False
+
+    store.apply(defs)
+
+    cache[registry_path] = {
+        "fingerprint": fingerprint,
+        "last_updated": _registry_last_updated(store),
+    }
+    with open(cache_path, "w") as f:
+        json.dump(cache, f)
+    return True
+
+
+def _registry_last_updated(store: FeatureStore) -> str:
+    """
+    When the store's registry was last committed, as seen by this process.
+    """
+    proto = store.registry.cached_registry_proto
+    if proto is None or not proto.HasField("last_updated"):
+        return ""
+    return proto.last_updated.ToJsonString()
@@ -0,0 +1,186 @@
+"""
+Protocol-level tests of the local pgbouncer stand-in, run through psycopg
+against a real Postgres: PG_HOST (default localhost), PG_PORT (5432),
+PG_DATABASE (performance), PG_USERNAME and PG_PASSWORD.  Skipped when no
+Postgres is reachable.
+"""
+
+import os
+import threading
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from benchmark.local_pgbouncer import LocalPgBouncer
+
+PG_HOST = os.getenv("PG_HOST", "localhost")
+PG_PORT = int(os.getenv("PG_PORT", 5432))
+PG_DATABASE = os.getenv("PG_DATABASE", "performance")
+PG_USERNAME = os.getenv("PG_USERNAME", "postgres")
+PG_PASSWORD = os.getenv("PG_PASSWORD")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def postgres():
+    try:
+        psycopg.connect(
+            host=PG_HOST,
+            port=PG_PORT,
+            dbname=PG_DATABASE,
+            user=PG_USERNAME,
+            password=PG_PASSWORD,
+            connect_timeout=3,
+        ).close()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+
+
+def start_pooler(**kwargs) -> LocalPgBouncer:
+    kwargs.setdefault("wait_timeout", 2.0)
+    kwargs.setdefault("password", PG_PASSWORD)
+    return LocalPgBouncer(
+        upstream_host=PG_HOST, upstream_port=PG_PORT, port=0, **kwargs
+    ).start()
+
+
+def connect(pooler: LocalPgBouncer, **kwargs):
+    # No password: the stand-in trusts its clients
+    return psycopg.connect(
+        host="127.0.0.1",
+        port=pooler.port,
+        dbname=PG_DATABASE,
+        user=PG_USERNAME,
+        sslmode="disable",
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def pooler():
+    pooler = start_pooler(pool_size=1)
+    yield pooler
+    pooler.stop()
+
+
+def backend_pid(conn) -> int:
+    return conn.execute("SELECT pg_backend_pid()").fetchone()[0]
+
+
+def test_login_replays_server_parameters(pooler):
+    with connect(pooler, autocommit=True) as conn:
+        assert conn.info.server_version > 0
+        assert conn.info.parameter_status("client_encoding") == "UTF8"
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_wrong_password_is_refused():
+    pooler = start_pooler(pool_size=1, password="not the password")
+    try:
+        with pytest.raises(psycopg.OperationalError, match="password"):
+            connect(pooler)
+    finally:
+        pooler.stop()
+
+
+def test_idle_clients_share_one_server_connection(pooler):
+    with connect(pooler, autocommit=True) as first, connect(
+        pooler, autocommit=True
+    ) as second:
+        assert backend_pid(first) == backend_pid(second)
+        assert pooler.stats["server_connections"] == 1
+
+
+def test_transaction_keeps_its_server_connection(pooler):
+    with connect(pooler) as conn, connect(pooler, autocommit=True) as other:
+        conn.execute("CREATE TEMPORARY TABLE pooled (x int)")
+        conn.execute("INSERT INTO pooled VALUES (1)")
+        # The only server connection is held by the open transaction
+        with pytest.raises(psycopg.OperationalError, match="no server connection"):
+            other.execute("SELECT 1")
+        assert conn.execute("SELECT count(*) FROM pooled").fetchone() == (1,)
+        conn.rollback()
+
+
+def test_session_mode_pins_a_server_connection():
+    pooler = start_pooler(pool_size=1, pool_mode="session")
+    try:
+        with connect(pooler, autocommit=True):
+            with pytest.raises(psycopg.OperationalError, match="no server connection"):
+                connect(pooler)
+    finally:
+        pooler.stop()
+
+
+def test_prepared_statements_are_shared(pooler):
+    query = "SELECT %s::int + 1"
+    with connect(pooler, autocommit=True) as first, connect(
+        pooler, autocommit=True
+    ) as second:
+        assert first.execute(query, (1,), prepare=True).fetchone() == (2,)
+        assert second.execute(query, (2,), prepare=True).fetchone() == (3,)
+        prepared = first.execute(
+            "SELECT count(*) FROM pg_prepared_statements WHERE statement = %s",
+            ("SELECT $1::int + 1",),
+        ).fetchone()
+        assert prepared == (1,)
+
+
+def test_deallocate_only_forgets_the_clients_own_statements(pooler):
+    query = "SELECT %s::int * 2"
+    with connect(pooler, autocommit=True) as first, connect(
+        pooler, autocommit=True
+    ) as second:
+        first.execute(query, (1,), prepare=True)
+        second.execute(query, (1,), prepare=True)
+        first.execute("DEALLOCATE ALL")
+        assert second.execute(query, (4,), prepare=True).fetchone() == (8,)
+        assert first.execute(query, (5,), prepare=True).fetchone() == (10,)
+
+
+def test_least_recently_used_statements_are_closed():
+    pooler = start_pooler(pool_size=1, max_prepared_statements=2)
+    try:
+        with connect(pooler, autocommit=True) as conn:
+            for offset in range(3):
+                conn.execute(f"SELECT %s::int + {offset}", (1,), prepare=True)
+            assert conn.execute(
+                "SELECT count(*) FROM pg_prepared_statements"
+            ).fetchone() == (2,)
+            # Prepared again on the server for the client still using it
+            assert conn.execute(
+                "SELECT %s::int + 0", (1,), prepare=True
+            ).fetchone() == (1,)
+    finally:
+        pooler.stop()
+
+
+def test_errors_skip_to_the_next_sync(pooler):
+    with connect(pooler, autocommit=True) as conn:
+        with pytest.raises(psycopg.errors.DivisionByZero):
+            with conn.pipeline():
+                conn.execute("SELECT %s::int", (1,), prepare=True)
+                conn.execute("SELECT 1/0")
+                conn.execute("SELECT %s::int - 1", (1,), prepare=True)
+        assert conn.execute("SELECT %s::int - 1", (3,), prepare=True).fetchone() == (2,)
+
+
+def test_copy_in_and_out(pooler):
+    with connect(pooler) as conn:
+        conn.execute("CREATE TEMPORARY TABLE copied (x int)")
+        with conn.cursor().copy("COPY copied FROM STDIN") as copy:
+            for x in range(5):
+                copy.write_row((x,))
+        with conn.cursor().copy("COPY copied TO STDOUT") as copy:
+            assert sorted(int(row[0]) for row in copy.rows()) == list(range(5))
+        conn.rollback()
+
+
+def test_cancel_reaches_the_server_connection(pooler):
+    with connect(pooler) as conn:
+        # cancel() blocks holding the GIL, starving the pooler's thread
+        threading.Timer(0.5, conn.cancel_safe).start()
+        with pytest.raises(psycopg.errors.QueryCanceled):
+            conn.execute("SELECT pg_sleep(10)")
+        conn.rollback()
+        assert conn.execute("SELECT 1").fetchone() == (1,)
@@ -1,85 +1,458 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-
-# Load the CSV files into DataFrames
-minio_results_path = "/mnt/data/minio_results.csv"
-parquet_results_path = "/mnt/data/parquet_test_results.csv"
-
-minio_results_df = pd.read_csv(minio_results_path)
-parquet_results_df = pd.read_csv(parquet_results_path)
-
-# Merge the two DataFrames on the common columns ('Number of columns', 'Number of rows')
-# and append suffixes to distinguish between the two data sources
-combined_df = pd.merge(
-    minio_results_df[
-        ["Number of columns", "Number of rows", "get_historical_feature read in ms"]
-    ],
-    parquet_results_df[
-        ["Number of columns", "Number of rows", "get_historical_feature read in ms"]
-    ],
-    on=["Number of columns", "Number of rows"],
-    suffixes=("_minio", "_parquet"),
-)
-
-# Rounding the milliseconds to the nearest integer
-combined_df["get_historical_feature read in ms_minio"] = (
-    combined_df["get_historical_feature read in ms_minio"].round(0).astype(int)
-)
-combined_df["get_historical_feature read in ms_parquet"] = (
-    combined_df["get_historical_feature read in ms_parquet"].round(0).astype(int)
-)
-
-# Adjusting the x-axis labels
-combined_df["Number of rows label"] = combined_df["Number of rows"].apply(
-    lambda x: f"{x // 1000}K" if x >= 1000 else str(x)
-)
-combined_df["Test Cases"] = combined_df.apply(
-    lambda row: f"{row['Number of columns']}, {row['Number of rows label']}", axis=1
-)
-
-# Plotting
-fig, ax = plt.subplots(figsize=(14, 8))
-
-# Setting the positions and width for the bars
-positions = list(range(len(combined_df["Test Cases"])))
-bar_width = 0.35
-
-# Plotting the bars
-minio_bars = ax.bar(
-    positions,
-    combined_df["get_historical_feature read in ms_minio"],
-    bar_width,
-    label="MinIO",
-    color="skyblue",
-)
-parquet_bars = ax.bar(
-    [p + bar_width for p in positions],
-    combined_df["get_historical_feature read in ms_parquet"],
-    bar_width,
-    label="Parquet",
-    color="lightgreen",
-)
-
-# Adding the labels, title, and legend
-ax.set_xlabel("Test Cases (Number of columns, Number of rows)")
-ax.set_ylabel("get_historical_feature read in ms (rounded)")
-ax.set_title("Comparison of get_historical_feature Read Times (MinIO vs Parquet)")
-ax.set_xticks([p + bar_width / 2 for p in positions])
-ax.set_xticklabels(combined_df["Test Cases"])
-ax.legend()
-
-# Adding the values on top of the bars
-for bar in minio_bars + parquet_bars:
-    height = bar.get_height()
-    ax.annotate(
-        f"{height}",
-        xy=(bar.get_x() + bar.get_width() / 2, height),
-        xytext=(0, 3),  # 3 points vertical offset
-        textcoords="offset points",
-        ha="center",
-        va="bottom",
+import argparse
+import csv
+import html
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# The benchmark harness lives at the root of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmark import RESULT_FIELDS, read_results, summarize
+
+# The latency column of the CSV files the per-store test scripts used to
+# write, with one row per (columns, rows) case and a single sample each.
+LEGACY_READ_COLUMN = "get_historical_feature read in ms"
+
+# Locust's `--csv` statistics, as kept in simple/feature_repo/results.
+LOCUST_COLUMNS = {
+    "p50_ms": "Median Response Time",
+    "mean_ms": "Average Response Time",
+    "min_ms": "Min Response Time",
+    "max_ms": "Max Response Time",
+    "p95_ms": "95%",
+    "p99_ms": "99%",
+}
+
+REPORT_STYLE = """
+  table {
+    width: 100%;
+    border-collapse: collapse;
+  }
+  table, th, td {
+    border: 1px solid black;
+  }
+  th, td {
+    padding: 8px;
+    text-align: left;
+  }
+  th {
+    background-color: #f2f2f2;
+  }
+  tr.regression {
+    background-color: #f8d7da;
+  }
+  tr.improvement {
+    background-color: #d4edda;
+  }
+"""
+
+
+def _empty_result(**fields) -> Dict:
+    result = {field: None for field in RESULT_FIELDS}
+    result["samples_ms"] = []
+    result.update(fields)
+    return result
+
+
+def _read_legacy_csv(rows: List[Dict], label: str) -> List[Dict]:
+    """Normalizes the single-sample CSVs of the old per-store run_test.py
+    and test_parquet_performance.py scripts."""
+    results = []
+    for row in rows:
+        latency = float(row[LEGACY_READ_COLUMN])
+        results.append(
+            _empty_result(
+                run_id=label,
+                backend="legacy",
+                num_columns=int(row["Number of columns"]),
+                num_rows=int(row["Number of rows"]),
+                phase="cold",
+                warmup=0,
+                trials=1,
+                size_bytes=(
+                    int(row["file size in bytes"])
+                    if row.get("file size in bytes")
+                    else None
+                ),
+                samples_ms=[latency],
+                **summarize([latency]),
+            )
+        )
+    return results
+
+
+def _read_locust_csv(rows: List[Dict], label: str) -> List[Dict]:
+    """Normalizes Locust's `_stats.csv` files, one result per request name.
+    Locust keeps percentiles rather than samples, so these results have no
+    confidence intervals."""
+    results = []
+    for row in rows:
+        if row["Name"] == "Aggregated":
+            continue
+        summary = {
+            field: float(row[column]) for field, column in LOCUST_COLUMNS.items()
+        }
+        results.append(
+            _empty_result(
+                run_id=label,
+                backend=row["Name"],
+                phase="load",
+                trials=int(row["Request Count"]),
+                size_bytes=int(float(row["Average Content Size"])),
+                **summary,
+            )
+        )
+    return results
+
+
+def load_run(path: str, label: Optional[str] = None) -> List[Dict]:
+    """Reads one results file into the benchmark harness' result schema.
+
+    Accepts the CSV and JSON files written by `python -m benchmark`, the
+    CSVs of the old per-store test scripts and Locust statistics CSVs.
+
+    :param path: The results file.
+    :param label: Names the run, replacing the run ids of harness results.
+        Harness results keep their run ids by default, other results are
+        named after the file.  Results of the old test scripts, which do
+        not record their store, all get the backend "legacy", so two of
+        them can be compared as runs.
+
+    :return results: The results, with the RESULT_FIELDS keys.
+    """
+    if path.endswith(".json"):
+        results = read_results(path)
+    else:
+        with open(path, newline="") as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        columns = set(rows[0]) if rows else set()
+        default_label = os.path.splitext(os.path.basename(path))[0]
+        if LEGACY_READ_COLUMN in columns:
+            return _read_legacy_csv(rows, label or default_label)
+        if "Request Count" in columns:
+            return _read_locust_csv(rows, label or default_label)
+        results = read_results(path)
+    if label is not None:
+        for result in results:
+            result["run_id"] = label
+    return results
+
+
+def bootstrap_speedup(
+    baseline_ms: Sequence[float],
+    candidate_ms: Sequence[float],
+    confidence: float = 0.95,
+    resamples: int = 2000,
+    seed: int = 0,
+) -> Optional[Tuple[float, float]]:
+    """A bootstrap confidence interval of the speedup of the median latency.
+
+    Both sets of samples are resampled independently, and the interval is
+    taken from the percentiles of the baseline median divided by the
+    candidate median.
+
+    :param baseline_ms: The baseline's latency samples in milliseconds.
+    :param candidate_ms: The candidate's latency samples in milliseconds.
+    :param confidence: The coverage of the interval.
+    :param resamples: The number of bootstrap resamples.
+    :param seed: Seeds the resampling, so reports are reproducible.
+
+    :return interval: The (low, high) speedup, or None if either side has
+        fewer than two samples.
+    """
+    if len(baseline_ms) < 2 or len(candidate_ms) < 2:
+        return None
+    rng = np.random.default_rng(seed)
+    baseline = np.asarray(baseline_ms, dtype=float)
+    candidate = np.asarray(candidate_ms, dtype=float)
+    baseline_medians = np.median(
+        rng.choice(baseline, (resamples, len(baseline))), axis=1
     )
+    candidate_medians = np.median(
+        rng.choice(candidate, (resamples, len(candidate))), axis=1
+    )
+    ratios = baseline_medians / candidate_medians
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(ratios, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def _case_key(result: Dict, by: str) -> Tuple:
+    key = (result["num_columns"], result["num_rows"], result["phase"])
+    return key if by == "backend" else (result["backend"],) + key
+
+
+def compare(
+    results: List[Dict],
+    baseline: Optional[str] = None,
+    by: str = "run",
+    threshold: float = 0.1,
+    confidence: float = 0.95,
+) -> List[Dict]:
+    """Compares every variant of each case against the baseline variant.
+
+    A variant is a run (`by="run"`), matched on backend, columns, rows and
+    phase, or a backend (`by="backend"`), matched on columns, rows and
+    phase.  When a variant measured a case more than once, the last result
+    is used.
+
+    The speedup is the baseline p50 over the candidate p50, so values above
+    1 are faster.  A comparison is a regression when the candidate is more
+    than `threshold` slower: judged on the upper end of the confidence
+    interval where there are samples to bootstrap, so noise alone does not
+    fail a run, and on the p50s otherwise.
+
+    :param results: Normalized results of every run.
+    :param baseline: The baseline variant; defaults to the first one seen.
+    :param by: "run" or "backend".
+    :param threshold: The tolerated slowdown, e.g. 0.1 for 10%.
+    :param confidence: The coverage of the speedup intervals.
+
+    :return comparisons: One per candidate variant and case.
+    """
+    variants: Dict[str, Dict[Tuple, Dict]] = {}
+    for result in results:
+        variant = result["run_id"] if by == "run" else result["backend"]
+        variants.setdefault(variant, {})[_case_key(result, by)] = result
+    if not variants:
+        return []
+    baseline = baseline or next(iter(variants))
+    if baseline not in variants:
+        raise ValueError(f"No results for baseline {baseline!r}: {sorted(variants)}")
+
+    slowest_speedup = 1 / (1 + threshold)
+    comparisons = []
+    for variant, cases in variants.items():
+        if variant == baseline:
+            continue
+        for key, candidate in cases.items():
+            reference = variants[baseline].get(key)
+            if reference is None:
+                continue
+            speedup = reference["p50_ms"] / candidate["p50_ms"]
+            interval = bootstrap_speedup(
+                reference["samples_ms"], candidate["samples_ms"], confidence
+            )
+            high = interval[1] if interval else speedup
+            low = interval[0] if interval else speedup
+            if high < slowest_speedup:
+                status = "regression"
+            elif low > 1 + threshold:
+                status = "improvement"
+            else:
+                status = "unchanged"
+            comparisons.append(
+                {
+                    "baseline": baseline,
+                    "candidate": variant,
+                    "backend": candidate["backend"],
+                    "num_columns": candidate["num_columns"],
+                    "num_rows": candidate["num_rows"],
+                    "phase": candidate["phase"],
+                    "baseline_p50_ms": reference["p50_ms"],
+                    "candidate_p50_ms": candidate["p50_ms"],
+                    "baseline_p99_ms": reference["p99_ms"],
+                    "candidate_p99_ms": candidate["p99_ms"],
+                    "speedup": speedup,
+                    "interval": interval,
+                    "status": status,
+                }
+            )
+    return comparisons
+
+
+def _format(value, digits: int = 2) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:,.{digits}f}"
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def render_html(
+    comparisons: List[Dict],
+    threshold: float,
+    confidence: float,
+    title: str = "Feast: Offline Store Benchmark Comparison",
+) -> str:
+    """Renders the comparisons as an HTML report with a table per candidate,
+    laid out like simple/feature_repo/results/historical_results_tests.html.
+    """
+    columns = [
+        "Backend",
+        "Columns",
+        "Rows",
+        "Phase",
+        "Baseline p50 (ms)",
+        "Candidate p50 (ms)",
+        "Baseline p99 (ms)",
+        "Candidate p99 (ms)",
+        "Speedup",
+        f"{confidence:.0%} Interval",
+        "Status",
+    ]
+    lines = [
+        "<!DOCTYPE html>",
+        '<html lang="en">',
+        "<head>",
+        '<meta charset="UTF-8">',
+        f"<title>{html.escape(title)}</title>",
+        f"<style>{REPORT_STYLE}</style>",
+        "</head>",
+        "<body>",
+        "",
+        f"<h2>{html.escape(title)}</h2>",
+        f"<p>Speedup is the baseline p50 over the candidate p50. Regressions are "
+        f"candidates more than {threshold:.0%} slower.</p>",
+    ]
+
+    candidates: Dict[Tuple[str, str], List[Dict]] = {}
+    for comparison in comparisons:
+        pair = (comparison["candidate"], comparison["baseline"])
+        candidates.setdefault(pair, []).append(comparison)
+
+    for (candidate, baseline), rows in candidates.items():
+        regressions = sum(row["status"] == "regression" for row in rows)
+        lines += [
+            "",
+            f"<h3>{html.escape(candidate)} against {html.escape(baseline)}"
+            f" ({regressions} regressions)</h3>",
+            "<table>",
+            "  <tr>",
+            *[f"    <th>{column}</th>" for column in columns],
+            "  </tr>",
+        ]
+        for row in rows:
+            interval = row["interval"]
+            cells = [
+                row["backend"],
+                row["num_columns"],
+                row["num_rows"],
+                row["phase"],
+                row["baseline_p50_ms"],
+                row["candidate_p50_ms"],
+                row["baseline_p99_ms"],
+                row["candidate_p99_ms"],
+                f"{row['speedup']:.2f}x",
+                f"{interval[0]:.2f}x - {interval[1]:.2f}x" if interval else "",
+                row["status"],
+            ]
+            lines.append(f'  <tr class="{row["status"]}">')
+            lines += [f"    <td>{html.escape(_format(cell))}</td>" for cell in cells]
+            lines.append("  </tr>")
+        lines.append("</table>")
+
+    lines += ["", "</body>", "</html>", ""]
+    return "\n".join(lines)
+
+
+def plot_comparison(comparisons: List[Dict], outfile: str):
+    """Draws the baseline and candidate p50 of every case as grouped bars."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    labels = [
+        f"{row['candidate']}\n{row['num_columns']}, {row['num_rows']}, {row['phase']}"
+        for row in comparisons
+    ]
+    positions = np.arange(len(comparisons))
+    bar_width = 0.35
+
+    fig, ax = plt.subplots(figsize=(max(8, len(comparisons) * 0.8), 8))
+    ax.bar(
+        positions,
+        [row["baseline_p50_ms"] for row in comparisons],
+        bar_width,
+        label="Baseline",
+        color="skyblue",
+    )
+    ax.bar(
+        positions + bar_width,
+        [row["candidate_p50_ms"] for row in comparisons],
+        bar_width,
+        label="Candidate",
+        color="lightgreen",
+    )
+    ax.set_xlabel("Test Cases (candidate, columns, rows, phase)")
+    ax.set_ylabel("get_historical_features p50 in ms")
+    ax.set_xticks(positions + bar_width / 2)
+    ax.set_xticklabels(labels, rotation=45, ha="right")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(outfile)
+    plt.close(fig)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Compares benchmark runs and reports regressions.
+
+    Example: `python analysis.py main=results_main.json pr=results_pr.json
+    --threshold 0.05 --html report.html`
+
+    :return status: 1 if any comparison regressed, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare benchmark runs and flag regressions."
+    )
+    parser.add_argument(
+        "runs",
+        nargs="+",
+        metavar="[LABEL=]PATH",
+        help="A results file, optionally labelled, e.g. main=results.json.",
+    )
+    parser.add_argument(
+        "--baseline", help="The run or backend to compare against; the first."
+    )
+    parser.add_argument(
+        "--by",
+        choices=["run", "backend"],
+        default="run",
+        help="Compare runs of the same backend, or backends with each other.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The slowdown, as a fraction, that counts as a regression.",
+    )
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--html", default="comparison.html")
+    parser.add_argument("--plot", help="Also save a bar chart to this file.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for run in args.runs:
+        label, separator, path = run.rpartition("=")
+        results.extend(load_run(path, label if separator else None))
+
+    comparisons = compare(
+        results, args.baseline, args.by, args.threshold, args.confidence
+    )
+    with open(args.html, "w") as f:
+        f.write(render_html(comparisons, args.threshold, args.confidence))
+    if args.plot:
+        plot_comparison(comparisons, args.plot)
+
+    regressions = [row for row in comparisons if row["status"] == "regression"]
+    for row in regressions:
+        case = [row["backend"], row["phase"]]
+        if row["num_columns"] is not None:
+            case.insert(1, f"{row['num_columns']}x{row['num_rows']}")
+        print(
+            f"Regression: {row['candidate']} {' '.join(case)}: "
+            f"p50 {row['baseline_p50_ms']:.1f} -> {row['candidate_p50_ms']:.1f} ms"
+        )
+    print(
+        f"{len(comparisons)} comparisons, {len(regressions)} regressions; "
+        f"report written to {args.html}"
+    )
+    return 1 if regressions else 0
+
 
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    sys.exit(main())
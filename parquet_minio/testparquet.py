@@ -1,11 +1,19 @@
+import os
+
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from pyarrow._s3fs import S3FileSystem
 from pyarrow.parquet import ParquetDataset
 
-# Set up the S3 filesystem client
-s3 = S3FileSystem()
+# Set up the S3 filesystem client, against FEAST_S3_ENDPOINT_URL if it is set
+# (e.g. `python -m benchmark.local_s3` for a local stand-in)
+endpoint_url = os.environ.get("FEAST_S3_ENDPOINT_URL")
+if endpoint_url:
+    scheme, _, endpoint = endpoint_url.rpartition("://")
+    s3 = S3FileSystem(endpoint_override=endpoint, scheme=scheme or "https")
+else:
+    s3 = S3FileSystem()
 # Uncomment and configure with your credentials and endpoint
 # s3 = S3FileSystem(
 #     key="accesskey",  # Replace with your MinIO access key
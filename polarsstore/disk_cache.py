@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class ParquetDiskCache:
+    """
+    A read-through cache of object store files on local disk.
+
+    Entries are named after the object path and its ETag, so a rewritten
+    object is fetched again and the stale copy is removed.  Entries are
+    touched on every hit and the least recently used ones are evicted once
+    the cache grows beyond `max_bytes`.  Files are only ever published with
+    an atomic rename, so several processes may share one cache directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _digest(value: str) -> str:
+        return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+    def get(self, fs, path: str) -> str:
+        """
+        Returns a local copy of `path` that matches the object's current
+        ETag, downloading it on a miss.
+
+        :param fs: An fsspec filesystem, e.g. the shared s3fs filesystem.
+        :param path: The object path without the `s3://` prefix.
+
+        :return: The path of the cached file on local disk.
+        """
+        info = fs.info(path, refresh=True)
+        prefix = self._digest(path)
+        local_path = os.path.join(
+            self.directory,
+            f"{prefix}-{self._digest(info.get('ETag', ''))}.parquet",
+        )
+
+        try:
+            os.utime(local_path)
+            return local_path
+        except FileNotFoundError:
+            pass
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            fs.get_file(path, tmp_path)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._evict(keep=local_path, stale_prefix=prefix)
+        return local_path
+
+    def _evict(self, keep: str, stale_prefix: str):
+        """
+        Removes older versions of the object that was just cached, then the
+        least recently used entries until the cache fits in `max_bytes`.
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".parquet") or entry.path == keep:
+                    continue
+                try:
+                    if entry.name.startswith(stale_prefix + "-"):
+                        os.remove(entry.path)
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process sharing the directory.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = os.path.getsize(keep) + sum(size for _, size, _ in entries)
+            for _, size, entry_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".parquet"):
+                    os.remove(entry.path)
@@ -0,0 +1,157 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import pyarrow as pa
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _max_rss_bytes() -> Optional[int]:
+    """
+    The peak resident set size of the process so far, over its whole life
+    rather than any one request.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class RequestMetrics:
+    """
+    Timings, counters and memory use of one offline store request, from
+    planning through to the conversion of its result.
+
+    Stage times are summed over every thread or task that worked on the
+    stage, so the stages of a request that fetched several files or feature
+    views at once can add up to more than its wall time.  Counters include
+    `bytes_read` (column chunk bytes fetched from parquet files), `rows_in`
+    (rows read from sources, where they are read eagerly) and `rows_out`.
+
+    `peak_arrow_bytes_delta` is the most arrow memory allocated above the
+    level at the start of the request, sampled as each stage begins and
+    ends.  The arrow allocator is shared by the process, so requests that
+    overlap count each other's allocations.  `process_peak_rss_bytes` is a
+    process-wide gauge: the peak resident set size of the process so far.
+    """
+
+    def __init__(self, request: str):
+        self.request = request
+        self.stage_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._start_arrow_bytes = pa.total_allocated_bytes()
+        self.peak_arrow_bytes_delta = 0
+        self._lock = threading.Lock()
+
+    def _sample_arrow_bytes(self):
+        # Called with the lock held
+        self.peak_arrow_bytes_delta = max(
+            self.peak_arrow_bytes_delta,
+            pa.total_allocated_bytes() - self._start_arrow_bytes,
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times the enclosed block as (part of) stage `name`.
+        """
+        with self._lock:
+            self._sample_arrow_bytes()
+        begin = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter_ns() - begin) / 1e9
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+                self._sample_arrow_bytes()
+
+    def count(self, name: str, value: int):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> Dict:
+        """
+        The metrics as plain data, e.g. for logging or a benchmark result.
+        """
+        with self._lock:
+            return {
+                "request": self.request,
+                "stage_seconds": dict(self.stage_seconds),
+                "counters": dict(self.counters),
+                "peak_arrow_bytes_delta": self.peak_arrow_bytes_delta,
+                "process_peak_rss_bytes": _max_rss_bytes(),
+            }
+
+    def to_prometheus(self, prefix: str = "polars_offline_store") -> str:
+        """
+        The metrics in the Prometheus text exposition format, labelled with
+        the request type, ready to be served or pushed to a gateway.
+        """
+        metrics = self.to_dict()
+        request = f'request="{self.request}"'
+        lines = [f"# TYPE {prefix}_stage_seconds gauge"]
+        for stage, seconds in sorted(metrics["stage_seconds"].items()):
+            lines.append(
+                f'{prefix}_stage_seconds{{{request},stage="{stage}"}} {seconds}'
+            )
+        for name, value in sorted(metrics["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name}{{{request}}} {value}")
+        for name in ("peak_arrow_bytes_delta", "process_peak_rss_bytes"):
+            if metrics[name] is not None:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name}{{{request}}} {metrics[name]}")
+        return "\n".join(lines) + "\n"
+
+    def record_opentelemetry(self, meter=None):
+        """
+        Records the metrics with OpenTelemetry: a duration histogram per
+        stage and a histogram per counter, each with a `request` attribute.
+        Needs the optional `opentelemetry-api` package.
+
+        :param meter: The meter to record with; by default the global meter
+            provider's meter for this module.
+        """
+        from opentelemetry import metrics as otel_metrics
+
+        meter = meter or otel_metrics.get_meter(__name__)
+        snapshot = self.to_dict()
+        duration = meter.create_histogram(
+            "polars_offline_store.stage.duration", unit="s"
+        )
+        for stage, seconds in snapshot["stage_seconds"].items():
+            duration.record(seconds, {"request": self.request, "stage": stage})
+        for name, value in snapshot["counters"].items():
+            meter.create_histogram(f"polars_offline_store.{name}").record(
+                value, {"request": self.request}
+            )
+        meter.create_histogram(
+            "polars_offline_store.peak_arrow_memory_delta", unit="By"
+        ).record(snapshot["peak_arrow_bytes_delta"], {"request": self.request})
+
+
+class _NoMetrics(RequestMetrics):
+    """
+    Discards everything, for callers that do not collect metrics.
+    """
+
+    def __init__(self):
+        super().__init__("none")
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def count(self, name: str, value: int):
+        pass
+
+
+NO_METRICS = _NoMetrics()
@@ -0,0 +1,328 @@
+import asyncio
+import io
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import NO_METRICS, RequestMetrics
+
+# (lower, upper) bounds on a column; either side may be None for open ended.
+ColumnRange = Tuple[Optional[Any], Optional[Any]]
+
+# How much of a file's tail to fetch when looking for its footer.
+FOOTER_READ_SIZE = 64 * 1024
+
+
+class ParquetFooter:
+    """
+    The parsed footer of one version of a parquet object, plus an index from
+    column name to column position so statistics can be looked up without
+    scanning every column of a wide schema.
+    """
+
+    def __init__(self, metadata: pq.FileMetaData, size: int):
+        self.metadata = metadata
+        self.size = size
+        self.column_index = {
+            metadata.schema.column(i).path: i for i in range(metadata.num_columns)
+        }
+
+    def row_group_overlaps(self, row_group: int, ranges: Dict[str, ColumnRange]):
+        """
+        Whether the min/max statistics of a row group allow any row to fall
+        inside every one of `ranges`.  Row groups without usable statistics
+        are always kept.
+        """
+        row_group_metadata = self.metadata.row_group(row_group)
+        for column, (lower, upper) in ranges.items():
+            index = self.column_index.get(column)
+            if index is None:
+                continue
+            statistics = row_group_metadata.column(index).statistics
+            if statistics is None or not statistics.has_min_max:
+                continue
+            if lower is not None and _comparable(statistics.max) < _comparable(lower):
+                return False
+            if upper is not None and _comparable(statistics.min) > _comparable(upper):
+                return False
+        return True
+
+    def prune_row_groups(self, ranges: Optional[Dict[str, ColumnRange]]) -> List[int]:
+        """
+        The row groups that may hold rows inside `ranges`.
+        """
+        row_groups = range(self.metadata.num_row_groups)
+        if not ranges:
+            return list(row_groups)
+        return [rg for rg in row_groups if self.row_group_overlaps(rg, ranges)]
+
+    def column_chunk_ranges(
+        self, row_groups: List[int], columns: Optional[List[str]]
+    ) -> Tuple[List[int], List[int]]:
+        """
+        The [start, end) byte ranges of the column chunks of `columns` (all
+        columns if None) in `row_groups`.
+        """
+        if columns is None:
+            column_indices = list(range(self.metadata.num_columns))
+        else:
+            column_indices = [
+                self.column_index[col] for col in columns if col in self.column_index
+            ]
+
+        starts, ends = [], []
+        for row_group in row_groups:
+            row_group_metadata = self.metadata.row_group(row_group)
+            for index in column_indices:
+                chunk = row_group_metadata.column(index)
+                start = chunk.data_page_offset
+                if chunk.has_dictionary_page and chunk.dictionary_page_offset:
+                    start = min(start, chunk.dictionary_page_offset)
+                starts.append(start)
+                ends.append(start + chunk.total_compressed_size)
+        return starts, ends
+
+
+class ParquetMetadataCache:
+    """
+    A bounded, thread-safe cache of parquet footers keyed by object path and
+    ETag.  A new ETag means the object was rewritten, so stale footers are
+    never served; they simply age out of the cache.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._footers: "OrderedDict[Tuple[str, str], ParquetFooter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, path: str, etag: str) -> Optional[ParquetFooter]:
+        """
+        The cached footer of this version of `path`, if there is one.
+        """
+        with self._lock:
+            footer = self._footers.get((path, etag))
+            if footer is not None:
+                self._footers.move_to_end((path, etag))
+            return footer
+
+    def store(self, path: str, etag: str, footer: ParquetFooter):
+        with self._lock:
+            self._footers[(path, etag)] = footer
+            while len(self._footers) > self.max_entries:
+                self._footers.popitem(last=False)
+
+    def get(self, fs, path: str) -> ParquetFooter:
+        """
+        Returns the footer of `path`, reading it from the object store only
+        when this version of the object has not been seen before.
+
+        :param fs: An fsspec filesystem, e.g. the shared s3fs filesystem.
+        :param path: The object path without the `s3://` prefix.
+        """
+        info = fs.info(path, refresh=True)
+        etag = info.get("ETag", "")
+        footer = self.lookup(path, etag)
+        if footer is None:
+            with fs.open(path, "rb", cache_type="none", size=info["size"]) as f:
+                footer = ParquetFooter(pq.ParquetFile(f).metadata, info["size"])
+            self.store(path, etag, footer)
+        return footer
+
+    async def get_async(self, fs, path: str) -> ParquetFooter:
+        """
+        Like `get`, but through an asynchronous s3fs filesystem.  A miss
+        costs one ranged GET of the file tail, or two for very wide schemas
+        whose footer does not fit in it.
+        """
+        info = await fs._info(path, refresh=True)
+        etag = info.get("ETag", "")
+        footer = self.lookup(path, etag)
+        if footer is None:
+            size = info["size"]
+            tail = await fs._cat_file(
+                path, start=max(0, size - FOOTER_READ_SIZE), end=size
+            )
+            # The file ends with the footer, its 4-byte length and "PAR1".
+            footer_length = int.from_bytes(tail[-8:-4], "little") + 8
+            if footer_length > len(tail):
+                tail = await fs._cat_file(path, start=size - footer_length, end=size)
+            metadata = pq.read_metadata(pa.BufferReader(tail[-footer_length:]))
+            footer = ParquetFooter(metadata, size)
+            self.store(path, etag, footer)
+        return footer
+
+    def clear(self):
+        with self._lock:
+            self._footers.clear()
+
+
+def _comparable(value):
+    """
+    Parquet statistics of naive timestamps come back as naive datetimes;
+    treat them as UTC so they can be compared with timezone aware bounds.
+    """
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def read_parquet(
+    fs,
+    path: str,
+    cache: ParquetMetadataCache,
+    columns: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, ColumnRange]] = None,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pa.Table:
+    """
+    Reads only the columns and row groups of a parquet object that a request
+    needs.  The footer comes from `cache`, and the column chunks of the
+    surviving row groups are fetched with ranged GETs.
+
+    :param fs: An fsspec filesystem, e.g. the shared s3fs filesystem.
+    :param path: The object path without the `s3://` prefix.
+    :param cache: The footer cache to consult.
+    :param columns: The columns to read, or None for all columns.
+    :param ranges: Inclusive (lower, upper) bounds per column used to skip
+        row groups whose statistics fall entirely outside the request.
+    :param metrics: Collects the time spent on the footer and on reading
+        (fetching and decoding) the row groups, and the bytes read.
+
+    :return: The selected rows as an arrow table.
+    """
+    with metrics.stage("footer"):
+        footer = cache.get(fs, path)
+    row_groups = footer.prune_row_groups(ranges)
+    starts, ends = footer.column_chunk_ranges(row_groups, columns)
+    metrics.count("bytes_read", sum(ends) - sum(starts))
+    # No read-ahead cache: every column chunk becomes one ranged GET, and
+    # pyarrow coalesces neighbouring chunks itself when pre-buffering.
+    with metrics.stage("read"):
+        with fs.open(path, "rb", cache_type="none", size=footer.size) as f:
+            parquet_file = pq.ParquetFile(f, metadata=footer.metadata, pre_buffer=True)
+            return parquet_file.read_row_groups(row_groups, columns=columns)
+
+
+def read_local_parquet(
+    path: str,
+    columns: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, ColumnRange]] = None,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pa.Table:
+    """
+    Reads the columns and row groups of a local parquet file that a request
+    needs, memory-mapping the file rather than copying it into memory.
+
+    :param path: The local file path.
+    :param columns: The columns to read, or None for all columns.
+    :param ranges: Inclusive (lower, upper) bounds per column used to skip
+        row groups whose statistics fall entirely outside the request.
+    :param metrics: Collects the time spent reading and the bytes read.
+
+    :return: The selected rows as an arrow table.
+    """
+    with metrics.stage("read"):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        footer = ParquetFooter(parquet_file.metadata, os.path.getsize(path))
+        row_groups = footer.prune_row_groups(ranges)
+        starts, ends = footer.column_chunk_ranges(row_groups, columns)
+        metrics.count("bytes_read", sum(ends) - sum(starts))
+        return parquet_file.read_row_groups(row_groups, columns=columns)
+
+
+class _PrefetchedFile(io.RawIOBase):
+    """
+    A read-only, seekable view of a remote file of which only some byte
+    ranges were downloaded.  pyarrow reads column chunks from it exactly as
+    from the real file, as long as it only asks for prefetched ranges.
+    """
+
+    def __init__(self, size: int, chunks: Dict[int, bytes]):
+        self._size = size
+        self._chunks = sorted(chunks.items())
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = offset
+        return self._position
+
+    def readinto(self, buffer):
+        for start, data in self._chunks:
+            if start <= self._position < start + len(data):
+                offset = self._position - start
+                length = min(len(buffer), len(data) - offset)
+                buffer[:length] = data[offset : offset + length]
+                self._position += length
+                return length
+        if self._position >= self._size:
+            return 0
+        raise IOError(f"Byte {self._position} was not prefetched")
+
+
+async def read_parquet_async(
+    fs,
+    path: str,
+    cache: ParquetMetadataCache,
+    columns: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, ColumnRange]] = None,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pa.Table:
+    """
+    The asynchronous counterpart of `read_parquet`.  The column chunks of the
+    surviving row groups are fetched concurrently with ranged GETs on the
+    event loop, then decoded on the default executor so the loop is never
+    blocked by decompression.
+
+    :param fs: An asynchronous s3fs filesystem.
+    :param path: The object path without the `s3://` prefix.
+    :param cache: The footer cache to consult.
+    :param columns: The columns to read, or None for all columns.
+    :param ranges: Inclusive (lower, upper) bounds per column used to skip
+        row groups whose statistics fall entirely outside the request.
+    :param metrics: Collects the time spent on the footer, fetching and
+        decoding, and the bytes read.
+
+    :return: The selected rows as an arrow table.
+    """
+    with metrics.stage("footer"):
+        footer = await cache.get_async(fs, path)
+    row_groups = footer.prune_row_groups(ranges)
+    starts, ends = footer.column_chunk_ranges(row_groups, columns)
+    metrics.count("bytes_read", sum(ends) - sum(starts))
+
+    chunks = {}
+    if starts:
+        with metrics.stage("fetch"):
+            data = await fs._cat_ranges(
+                [path] * len(starts), starts, ends, on_error="raise"
+            )
+        chunks = dict(zip(starts, data))
+
+    def decode() -> pa.Table:
+        with metrics.stage("decode"):
+            parquet_file = pq.ParquetFile(
+                pa.PythonFile(_PrefetchedFile(footer.size, chunks), mode="r"),
+                metadata=footer.metadata,
+                pre_buffer=False,
+            )
+            return parquet_file.read_row_groups(row_groups, columns=columns)
+
+    return await asyncio.get_running_loop().run_in_executor(None, decode)
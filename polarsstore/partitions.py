@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+GLOB_CHARACTERS = ("*", "?", "[")
+
+
+def resolve_files(fs, path: str) -> List[str]:
+    """
+    Expands a data source path into the parquet files it names.  The path
+    may be a single file, a directory (searched recursively, e.g. a hive
+    partitioned dataset or a persisted saved dataset) or a glob such as
+    `bucket/fv/date=2026-10-*/part-*.parquet`.
+
+    :param fs: An fsspec filesystem, e.g. the shared s3fs filesystem.
+    :param path: The path without any `s3://` prefix.
+
+    :return: The matching files, sorted so reads are deterministic.
+    """
+    if any(character in path for character in GLOB_CHARACTERS):
+        files = fs.glob(path)
+    elif path.endswith(".parquet"):
+        # The common single-object case costs no listing round trip.
+        return [path]
+    elif fs.isdir(path):
+        files = [file for file in fs.find(path) if file.endswith(".parquet")]
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"No parquet files match {path}")
+    return sorted(files)
+
+
+async def resolve_files_async(fs, path: str) -> List[str]:
+    """
+    The asynchronous counterpart of `resolve_files`, for an asynchronous
+    s3fs filesystem.
+    """
+    if any(character in path for character in GLOB_CHARACTERS):
+        files = await fs._glob(path)
+    elif path.endswith(".parquet"):
+        return [path]
+    elif await fs._isdir(path):
+        files = [file for file in await fs._find(path) if file.endswith(".parquet")]
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"No parquet files match {path}")
+    return sorted(files)
+
+
+def hive_partitions(path: str) -> Dict[str, str]:
+    """
+    The `key=value` directory segments of a hive-style partitioned path.
+    """
+    partitions = {}
+    for segment in path.split("/")[:-1]:
+        key, separator, value = segment.partition("=")
+        if separator and key:
+            partitions[key] = value
+    return partitions
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _partition_interval(value: str):
+    """
+    The [start, end) interval of event time a date partition covers: a whole
+    day for `2026-10-17`, a single instant for a full timestamp.  Naive
+    values are taken to be UTC.
+    """
+    try:
+        start = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    start = _utc(start)
+    if len(value) == len("YYYY-MM-DD"):
+        return start, start + timedelta(days=1)
+    return start, start + timedelta(microseconds=1)
+
+
+def prune_partitions(
+    files: List[str],
+    partition_key: str,
+    lower: Optional[datetime],
+    upper: Optional[datetime],
+) -> List[str]:
+    """
+    Drops files whose date partition lies entirely outside [lower, upper].
+    Files without a parseable `partition_key` segment are always kept.
+
+    :param files: The candidate files.
+    :param partition_key: The hive key holding the event date, e.g. `date`.
+    :param lower: The earliest event timestamp of interest, or None.
+    :param upper: The latest event timestamp of interest, or None.
+    """
+    lower, upper = _utc(lower), _utc(upper)
+    kept = []
+    for file in files:
+        value = hive_partitions(file).get(partition_key)
+        interval = _partition_interval(value) if value is not None else None
+        if interval is not None:
+            start, end = interval
+            if lower is not None and end <= lower:
+                continue
+            if upper is not None and start > upper:
+                continue
+        kept.append(file)
+    return kept
@@ -1,153 +1,1217 @@
+import pandas as pd
 import polars as pl
+import pyarrow as pa
 import pyarrow.parquet as pq
-import s3fs
+from feast.errors import SavedDatasetLocationAlreadyExists
+from feast.infra.offline_stores.file_source import SavedDatasetFileStorage
 from feast.infra.offline_stores.offline_store import (
     OfflineStore,
     RetrievalJob,
+    RetrievalMetadata,
 )
 from feast.infra.registry.registry import Registry
 from feast.feature_view import FeatureView
+from feast.on_demand_feature_view import OnDemandFeatureView
 from feast.repo_config import RepoConfig
 from feast.data_source import DataSource
+from feast.saved_dataset import SavedDatasetStorage
 
-from typing import List, Union, Optional, Dict, Any
+from typing import List, Union, Optional, Dict, Any, Iterator, Tuple
+import asyncio
 import logging
+import weakref
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pydantic import BaseModel
 import os
 
+import fsspec
+
+from disk_cache import ParquetDiskCache
+from instrumentation import NO_METRICS, RequestMetrics
+from parquet_metadata import (
+    ColumnRange,
+    ParquetMetadataCache,
+    read_local_parquet,
+    read_parquet,
+    read_parquet_async,
+)
+from partitions import (
+    hive_partitions,
+    prune_partitions,
+    resolve_files,
+    resolve_files_async,
+)
+from s3_registry import get_async_s3_filesystem, get_s3_filesystem
+
 s3_access_key = os.environ.get("AWS_ACCESS_KEY_ID")
 s3_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
 
 
+ENTITY_TIMESTAMP_COLUMN = "event_timestamp"
+
+# Parquet footers of MinIO objects, shared by every request in the process.
+_metadata_cache = ParquetMetadataCache()
+
+# Local read-through caches of MinIO objects, one per configured directory.
+_disk_caches: Dict[Tuple[str, int], ParquetDiskCache] = {}
+
+# Limits on concurrent async requests, one per event loop.
+_async_request_semaphores: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]"
+) = weakref.WeakKeyDictionary()
+
+
+def _join_keys(fv: FeatureView) -> List[str]:
+    """
+    Join key columns of a feature view, as named in its batch source.
+    """
+    return [col.name for col in fv.entity_columns]
+
+
+def _entity_join_keys(fv: FeatureView) -> List[str]:
+    """
+    Join key columns of a feature view, as named in the entity dataframe.
+    """
+    return [fv.projection.join_key_map.get(key, key) for key in _join_keys(fv)]
+
+
+def _to_utc(column: str, dtype: pl.DataType) -> pl.Expr:
+    """
+    Normalise a datetime column to UTC microseconds so that the entity and
+    feature timestamps can be compared and as-of joined.  Naive timestamps
+    are assumed to already be in UTC.
+    """
+    if getattr(dtype, "time_zone", None) is None:
+        expr = pl.col(column).dt.replace_time_zone("UTC")
+    else:
+        expr = pl.col(column).dt.convert_time_zone("UTC")
+    return expr.dt.cast_time_unit("us")
+
+
+def _storage_options(config: RepoConfig) -> Dict[str, str]:
+    """
+    Object store options handed to polars when scanning from MinIO.
+    """
+    options = {
+        "aws_endpoint_url": config.offline_store.minio_endpoint,
+        "aws_access_key_id": s3_access_key,
+        "aws_secret_access_key": s3_secret_key,
+        "aws_allow_http": "true",
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _s3_filesystem(config: RepoConfig):
+    """
+    The process-wide, pooled S3 filesystem for the configured MinIO endpoint.
+    """
+    return get_s3_filesystem(
+        config.offline_store.minio_endpoint,
+        s3_access_key,
+        s3_secret_key,
+        config.offline_store.max_pool_connections,
+    )
+
+
+def _disk_cache(config: RepoConfig) -> Optional[ParquetDiskCache]:
+    """
+    The local disk cache configured for the offline store, if any.
+    """
+    directory = config.offline_store.disk_cache_path
+    if not directory:
+        return None
+    key = (directory, config.offline_store.disk_cache_max_bytes)
+    if key not in _disk_caches:
+        _disk_caches[key] = ParquetDiskCache(*key)
+    return _disk_caches[key]
+
+
+def _files_in_range(
+    config: RepoConfig,
+    files: List[str],
+    ranges: Optional[Dict[str, ColumnRange]],
+    timestamp_field: Optional[str],
+) -> Tuple[List[str], bool]:
+    """
+    Drops files in date partitions entirely outside the `timestamp_field`
+    range.  One file is kept even when every partition is pruned, so the
+    result still carries the source schema; the flag says whether that
+    happened and the scan should come back empty.
+    """
+    if not ranges or timestamp_field not in ranges:
+        return files, False
+    lower, upper = ranges[timestamp_field]
+    files_in_range = prune_partitions(
+        files, config.offline_store.date_partition_key, lower, upper
+    )
+    return files_in_range or files[:1], not files_in_range
+
+
+def _file_columns(file: str, columns: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    The requested columns that are stored in `file` rather than encoded in
+    its hive partition path.
+    """
+    if columns is None:
+        return None
+    partitions = hive_partitions(file)
+    return [col for col in columns if col not in partitions]
+
+
+def _with_partitions(
+    table: pa.Table, file: str, columns: Optional[List[str]]
+) -> pl.DataFrame:
+    """
+    Adds the requested hive partition keys of `file` back to its rows.
+    """
+    return pl.from_arrow(table).with_columns(
+        pl.lit(value).alias(key)
+        for key, value in hive_partitions(file).items()
+        if columns is None or key in columns
+    )
+
+
+def _scan_source(
+    config: RepoConfig,
+    path: str,
+    columns: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, ColumnRange]] = None,
+    timestamp_field: Optional[str] = None,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    Lazily scan the parquet data behind a data source.
+
+    The path may name one file, a directory or a glob of (hive partitioned)
+    files.  Files in date partitions entirely outside the `timestamp_field`
+    range are skipped.  For MinIO objects the local disk cache is consulted
+    first, if one is configured.  Otherwise the cached footer is used to
+    fetch only the requested `columns` of the row groups whose statistics
+    overlap `ranges`.  Either way the files are read in parallel, at most
+    `max_concurrent_reads` at a time.  Failing both, polars scans the files
+    and prunes with its own predicate pushdown.
+    """
+    if path.startswith("s3://"):
+        fs, prefix = _s3_filesystem(config), "s3://"
+    else:
+        fs, prefix = fsspec.filesystem("file"), ""
+
+    with metrics.stage("list_files"):
+        files, empty = _files_in_range(
+            config, resolve_files(fs, path[len(prefix) :]), ranges, timestamp_field
+        )
+
+    disk_cache = _disk_cache(config)
+    if prefix and (
+        disk_cache is not None or config.offline_store.cache_parquet_metadata
+    ):
+
+        def read_file(file: str) -> pl.DataFrame:
+            file_columns = _file_columns(file, columns)
+            if disk_cache is not None:
+                with metrics.stage("disk_cache"):
+                    local_path = disk_cache.get(fs, file)
+                table = read_local_parquet(
+                    local_path, columns=file_columns, ranges=ranges, metrics=metrics
+                )
+            else:
+                table = read_parquet(
+                    fs,
+                    file,
+                    _metadata_cache,
+                    columns=file_columns,
+                    ranges=ranges,
+                    metrics=metrics,
+                )
+            metrics.count("rows_in", table.num_rows)
+            return _with_partitions(table, file, columns)
+
+        if len(files) == 1:
+            frames = [read_file(files[0])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=config.offline_store.max_concurrent_reads
+            ) as executor:
+                frames = list(executor.map(read_file, files))
+        lf = pl.concat(frames, how="diagonal_relaxed").lazy()
+    else:
+        lf = _polars_scan(config, prefix, files)
+        if columns is not None:
+            lf = lf.select(columns)
+
+    return lf.head(0) if empty else lf
+
+
+def _reads_asynchronously(config: RepoConfig, path: str) -> bool:
+    """
+    Whether `_scan_source_async` can read a source without blocking the
+    event loop: MinIO objects read through the footer cache.  Local files
+    and the disk cache go through the synchronous path on a worker thread.
+    """
+    return (
+        path.startswith("s3://")
+        and config.offline_store.cache_parquet_metadata
+        and _disk_cache(config) is None
+    )
+
+
+async def _scan_source_async(
+    config: RepoConfig,
+    path: str,
+    columns: Optional[List[str]] = None,
+    ranges: Optional[Dict[str, ColumnRange]] = None,
+    timestamp_field: Optional[str] = None,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    The asynchronous counterpart of `_scan_source` for sources that
+    `_reads_asynchronously`.  Listing, footers and column chunks are all
+    fetched on the event loop, at most `max_concurrent_reads` files at a
+    time, so a cancelled request stops issuing GETs at its next await.
+    """
+    fs = await get_async_s3_filesystem(
+        config.offline_store.minio_endpoint,
+        s3_access_key,
+        s3_secret_key,
+        config.offline_store.max_pool_connections,
+    )
+    with metrics.stage("list_files"):
+        files, empty = _files_in_range(
+            config,
+            await resolve_files_async(fs, path[len("s3://") :]),
+            ranges,
+            timestamp_field,
+        )
+
+    semaphore = asyncio.Semaphore(config.offline_store.max_concurrent_reads)
+
+    async def read_file(file: str) -> pl.DataFrame:
+        async with semaphore:
+            table = await read_parquet_async(
+                fs,
+                file,
+                _metadata_cache,
+                columns=_file_columns(file, columns),
+                ranges=ranges,
+                metrics=metrics,
+            )
+        metrics.count("rows_in", table.num_rows)
+        return _with_partitions(table, file, columns)
+
+    frames = await asyncio.gather(*[read_file(file) for file in files])
+    lf = pl.concat(frames, how="diagonal_relaxed").lazy()
+    return lf.head(0) if empty else lf
+
+
+def _polars_scan(config: RepoConfig, prefix: str, files: List[str]) -> pl.LazyFrame:
+    """
+    A polars scan of `files`, with hive partition keys exposed as columns.
+    """
+    return pl.scan_parquet(
+        [prefix + file for file in files],
+        storage_options=_storage_options(config) if prefix else None,
+        hive_partitioning=True,
+    )
+
+
+def _entity_query(
+    config: RepoConfig, query: str, feature_views: List[FeatureView]
+) -> pl.LazyFrame:
+    """
+    Plan a SQL entity query in which every feature view (and its named
+    batch source) is registered as a lazily scanned table.  Polars expands
+    directories and globs itself, so planning does no I/O.
+    """
+    ctx = pl.SQLContext()
+    for fv in feature_views:
+        path = fv.batch_source.path
+        prefix = "s3://" if path.startswith("s3://") else ""
+        lf = _polars_scan(config, prefix, [path[len(prefix) :]])
+        ctx.register(fv.name, lf)
+        if fv.batch_source.name:
+            ctx.register(fv.batch_source.name, lf)
+    return ctx.execute(query, eager=False)
+
+
+def _entity_frame(
+    config: RepoConfig,
+    entity_df: Union[pl.DataFrame, pd.DataFrame, pa.Table, str],
+    feature_views: List[FeatureView],
+) -> pl.DataFrame:
+    """
+    Turn any supported entity_df into a polars DataFrame.
+
+    pandas and arrow inputs are converted through arrow, which shares the
+    underlying buffers wherever the types allow.  A string is run as a
+    polars SQL query (see `_entity_query`), so the query is planned together
+    with the scans and only the rows and columns it selects are ever read.
+    """
+    if isinstance(entity_df, str):
+        return _entity_query(config, entity_df, feature_views).collect()
+    if isinstance(entity_df, pd.DataFrame):
+        return pl.from_pandas(entity_df)
+    if isinstance(entity_df, (pa.Table, pa.RecordBatch)):
+        return pl.from_arrow(entity_df)
+    if isinstance(entity_df, pl.LazyFrame):
+        return entity_df.collect()
+    return entity_df
+
+
+async def _entity_frame_async(
+    config: RepoConfig,
+    entity_df: Union[pl.DataFrame, pd.DataFrame, pa.Table, str],
+    feature_views: List[FeatureView],
+) -> pl.DataFrame:
+    """
+    Like `_entity_frame`, but queries run with `collect_async` on polars'
+    thread pool instead of blocking the event loop.
+    """
+    if isinstance(entity_df, str):
+        return await _entity_query(config, entity_df, feature_views).collect_async()
+    if isinstance(entity_df, pl.LazyFrame):
+        return await entity_df.collect_async()
+    return _entity_frame(config, entity_df, feature_views)
+
+
+def _window_filter(
+    feature_lf: pl.LazyFrame,
+    timestamp_field: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+) -> pl.LazyFrame:
+    """
+    Keep the rows whose `timestamp_field` lies inside [start_date, end_date).
+    """
+    timestamp_dtype = feature_lf.collect_schema()[timestamp_field]
+    if start_date is not None:
+        feature_lf = feature_lf.filter(
+            pl.col(timestamp_field) >= pl.lit(start_date).cast(timestamp_dtype)
+        )
+    if end_date is not None:
+        feature_lf = feature_lf.filter(
+            pl.col(timestamp_field) < pl.lit(end_date).cast(timestamp_dtype)
+        )
+    return feature_lf
+
+
+def _scan_window(
+    config: RepoConfig,
+    path: str,
+    columns: List[str],
+    timestamp_field: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    Scan `columns` of the rows whose `timestamp_field` lies inside
+    [start_date, end_date), skipping row groups outside the window.
+    """
+    feature_lf = _scan_source(
+        config,
+        path,
+        columns=columns,
+        ranges={timestamp_field: (start_date, end_date)},
+        timestamp_field=timestamp_field,
+        metrics=metrics,
+    )
+    return _window_filter(feature_lf, timestamp_field, start_date, end_date)
+
+
+async def _scan_window_async(
+    config: RepoConfig,
+    path: str,
+    columns: List[str],
+    timestamp_field: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    The asynchronous counterpart of `_scan_window`.
+    """
+    if not _reads_asynchronously(config, path):
+        return await asyncio.to_thread(
+            _scan_window,
+            config,
+            path,
+            columns,
+            timestamp_field,
+            start_date,
+            end_date,
+            metrics,
+        )
+    feature_lf = await _scan_source_async(
+        config,
+        path,
+        columns=columns,
+        ranges={timestamp_field: (start_date, end_date)},
+        timestamp_field=timestamp_field,
+        metrics=metrics,
+    )
+    return _window_filter(feature_lf, timestamp_field, start_date, end_date)
+
+
+def _pull_all_columns(
+    join_key_columns: List[str],
+    feature_name_columns: List[str],
+    timestamp_field: str,
+    created_timestamp_column: Optional[str],
+) -> List[str]:
+    """
+    The columns `pull_all_from_table_or_query` returns.  Like Feast's file
+    offline store, these include the created timestamp, which materialization
+    uses to pick the latest of rows sharing an event timestamp.
+    """
+    columns = join_key_columns + feature_name_columns + [timestamp_field]
+    if created_timestamp_column and created_timestamp_column not in columns:
+        columns.append(created_timestamp_column)
+    return columns
+
+
+def _feature_ref_index(feature_refs: List[str]) -> Dict[str, List[str]]:
+    """
+    The requested feature names of every feature view, parsed from the
+    `view:feature` references in a single pass instead of one scan of the
+    references per feature view.
+    """
+    index: Dict[str, List[str]] = {}
+    for ref in feature_refs:
+        view, _, feature = ref.partition(":")
+        index.setdefault(view, []).append(feature)
+    return index
+
+
+def _feature_view_scan(
+    fv: FeatureView,
+    selected_features: List[str],
+    entity_df: pl.DataFrame,
+    min_timestamp: datetime,
+    max_timestamp: datetime,
+) -> Dict[str, Any]:
+    """
+    The `_scan_source` arguments that fetch one feature view's rows for an
+    entity frame: the requested columns, bounded to the entity key range
+    and the ttl window.
+    """
+    join_keys = _join_keys(fv)
+    timestamp_field = fv.batch_source.timestamp_field
+    created_timestamp_column = fv.batch_source.created_timestamp_column
+
+    sort_columns = [timestamp_field]
+    if created_timestamp_column:
+        sort_columns.append(created_timestamp_column)
+
+    lower_timestamp = min_timestamp - fv.ttl if fv.ttl else None
+    ranges = {
+        join_key: (
+            entity_df[entity_join_key].min(),
+            entity_df[entity_join_key].max(),
+        )
+        for join_key, entity_join_key in zip(join_keys, _entity_join_keys(fv))
+    }
+    ranges[timestamp_field] = (lower_timestamp, max_timestamp)
+
+    return dict(
+        path=fv.batch_source.path,
+        columns=join_keys + sort_columns + selected_features,
+        ranges=ranges,
+        timestamp_field=timestamp_field,
+    )
+
+
+def _shape_feature_view(
+    feature_lf: pl.LazyFrame,
+    fv: FeatureView,
+    selected_features: List[str],
+    entity_df: pl.DataFrame,
+    min_timestamp: datetime,
+    max_timestamp: datetime,
+    full_feature_names: bool,
+) -> pl.LazyFrame:
+    """
+    Shape a feature view's scanned rows for the as-of join: filtered to the
+    entity keys and ttl window, one row per (keys, timestamp), with the join
+    keys and event timestamp named as in the entity frame.
+    """
+    join_keys = _join_keys(fv)
+    entity_join_keys = _entity_join_keys(fv)
+    timestamp_field = fv.batch_source.timestamp_field
+    created_timestamp_column = fv.batch_source.created_timestamp_column
+
+    sort_columns = [timestamp_field]
+    if created_timestamp_column:
+        sort_columns.append(created_timestamp_column)
+
+    lower_timestamp = min_timestamp - fv.ttl if fv.ttl else None
+    timestamp_dtype = feature_lf.collect_schema()[timestamp_field]
+
+    feature_lf = feature_lf.filter(
+        *[
+            pl.col(join_key).is_in(entity_df[entity_join_key].unique().implode())
+            for join_key, entity_join_key in zip(join_keys, entity_join_keys)
+        ],
+        pl.col(timestamp_field) <= pl.lit(max_timestamp).cast(timestamp_dtype),
+    )
+    if lower_timestamp is not None:
+        feature_lf = feature_lf.filter(
+            pl.col(timestamp_field) >= pl.lit(lower_timestamp).cast(timestamp_dtype)
+        )
+
+    # One multi-column expression covers every feature, however wide the
+    # view, instead of one expression or rename entry per column.
+    features = pl.col(selected_features)
+    if full_feature_names:
+        features = features.name.prefix(fv.name + "__")
+
+    # Keep one row per (keys, timestamp), preferring the most
+    # recently created one, so the as-of join never fans out.
+    feature_lf = (
+        feature_lf.sort(sort_columns)
+        .unique(
+            subset=join_keys + [timestamp_field],
+            keep="last",
+            maintain_order=True,
+        )
+        .select(
+            [
+                pl.col(join_key).alias(entity_join_key)
+                for join_key, entity_join_key in zip(join_keys, entity_join_keys)
+            ]
+            + [_to_utc(timestamp_field, timestamp_dtype).alias(ENTITY_TIMESTAMP_COLUMN)]
+            + [features]
+        )
+    )
+
+    return feature_lf
+
+
+def _prepare_feature_view(
+    config: RepoConfig,
+    fv: FeatureView,
+    selected_features: List[str],
+    entity_df: pl.DataFrame,
+    min_timestamp: datetime,
+    max_timestamp: datetime,
+    full_feature_names: bool,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    Fetch one feature view's rows for an entity frame and shape them for the
+    as-of join.
+    """
+    feature_lf = _scan_source(
+        config,
+        **_feature_view_scan(
+            fv, selected_features, entity_df, min_timestamp, max_timestamp
+        ),
+        metrics=metrics,
+    )
+    with metrics.stage("plan"):
+        return _shape_feature_view(
+            feature_lf,
+            fv,
+            selected_features,
+            entity_df,
+            min_timestamp,
+            max_timestamp,
+            full_feature_names,
+        )
+
+
+async def _prepare_feature_view_async(
+    config: RepoConfig,
+    fv: FeatureView,
+    selected_features: List[str],
+    entity_df: pl.DataFrame,
+    min_timestamp: datetime,
+    max_timestamp: datetime,
+    full_feature_names: bool,
+    metrics: RequestMetrics = NO_METRICS,
+) -> pl.LazyFrame:
+    """
+    The asynchronous counterpart of `_prepare_feature_view`.
+    """
+    if not _reads_asynchronously(config, fv.batch_source.path):
+        return await asyncio.to_thread(
+            _prepare_feature_view,
+            config,
+            fv,
+            selected_features,
+            entity_df,
+            min_timestamp,
+            max_timestamp,
+            full_feature_names,
+            metrics,
+        )
+    feature_lf = await _scan_source_async(
+        config,
+        **_feature_view_scan(
+            fv, selected_features, entity_df, min_timestamp, max_timestamp
+        ),
+        metrics=metrics,
+    )
+    with metrics.stage("plan"):
+        return _shape_feature_view(
+            feature_lf,
+            fv,
+            selected_features,
+            entity_df,
+            min_timestamp,
+            max_timestamp,
+            full_feature_names,
+        )
+
+
+def _latest_per_entity(
+    feature_lf: pl.LazyFrame,
+    join_key_columns: List[str],
+    timestamp_field: str,
+    created_timestamp_column: Optional[str],
+) -> pl.LazyFrame:
+    """
+    Each entity's latest row, picked with a hash aggregation rather than
+    sorting the whole window.  Ties on the event timestamp are broken by the
+    created timestamp.
+    """
+    latest_column = timestamp_field
+    if created_timestamp_column:
+        feature_lf = feature_lf.filter(
+            pl.col(timestamp_field)
+            == pl.col(timestamp_field).max().over(join_key_columns)
+        )
+        latest_column = created_timestamp_column
+
+    return feature_lf.group_by(join_key_columns).agg(
+        pl.all().get(pl.col(latest_column).arg_max())
+    )
+
+
+def _prepare_entity_frame(
+    entity_df: pl.DataFrame, feature_views: List[FeatureView]
+) -> Tuple[pl.DataFrame, datetime, datetime, List[str]]:
+    """
+    Normalise the entity timestamps to UTC and collect the time range and
+    the entity join keys of every feature view, in request order.
+    """
+    entity_df = entity_df.with_columns(
+        _to_utc(ENTITY_TIMESTAMP_COLUMN, entity_df.schema[ENTITY_TIMESTAMP_COLUMN])
+    )
+    min_timestamp = entity_df[ENTITY_TIMESTAMP_COLUMN].min()
+    max_timestamp = entity_df[ENTITY_TIMESTAMP_COLUMN].max()
+
+    entity_keys = []
+    for fv in feature_views:
+        for join_key in _entity_join_keys(fv):
+            if join_key not in entity_keys:
+                entity_keys.append(join_key)
+
+    return entity_df, min_timestamp, max_timestamp, entity_keys
+
+
+def _join_feature_views(
+    config: RepoConfig,
+    entity_df: pl.DataFrame,
+    entity_keys: List[str],
+    feature_views: List[FeatureView],
+    feature_lfs: List[pl.LazyFrame],
+    feature_refs: List[str],
+    min_timestamp: datetime,
+    max_timestamp: datetime,
+    full_feature_names: bool,
+    metrics: RequestMetrics = NO_METRICS,
+) -> "CustomRetrievalJob":
+    """
+    Build a single lazy plan that as-of joins every prepared feature view
+    onto the entity frame.
+    """
+    with metrics.stage("plan"):
+        # The feature views are as-of joined onto the distinct entity (keys,
+        # timestamp) pairs, which are sorted once up front.  Nothing is read
+        # until the final collect, so polars can push the projection and the
+        # filters down into the parquet reader.
+        result_lf = (
+            entity_df.lazy()
+            .select(entity_keys + [ENTITY_TIMESTAMP_COLUMN])
+            .unique()
+            .sort(ENTITY_TIMESTAMP_COLUMN)
+        )
+
+        for fv, feature_lf in zip(feature_views, feature_lfs):
+            result_lf = result_lf.join_asof(
+                feature_lf,
+                on=ENTITY_TIMESTAMP_COLUMN,
+                by=_entity_join_keys(fv),
+                strategy="backward",
+                tolerance=fv.ttl or None,
+                check_sortedness=False,
+            )
+
+        result_lf = entity_df.lazy().join(
+            result_lf,
+            on=entity_keys + [ENTITY_TIMESTAMP_COLUMN],
+            how="left",
+            nulls_equal=True,
+            maintain_order="left",
+        )
+
+    return CustomRetrievalJob(
+        result_lf,
+        config,
+        full_feature_names=full_feature_names,
+        metadata=PolarsRetrievalMetadata(
+            features=feature_refs,
+            keys=[col for col in entity_df.columns if col != ENTITY_TIMESTAMP_COLUMN],
+            min_event_timestamp=min_timestamp,
+            max_event_timestamp=max_timestamp,
+            metrics=metrics,
+        ),
+    )
+
+
+def _async_request_slots(config: RepoConfig) -> asyncio.Semaphore:
+    """
+    The running event loop's limit on concurrent async offline store
+    requests, so a burst of feature server requests queues on the loop
+    instead of piling up connections and memory.  A request holds a slot
+    while it fetches its sources and again while `to_polars_async` runs its
+    plan, which is where scans of local and uncached sources do their I/O.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _async_request_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(
+            config.offline_store.max_concurrent_async_requests
+        )
+        _async_request_semaphores[loop] = semaphore
+    return semaphore
+
+
 class PolarsOfflineStoreConfig(BaseModel):
     type: str = "polarsfeaturestore.PolarsOfflineStore"
     minio_endpoint: str
     bucket_name: str
+    # Upper bound on pooled keep-alive connections to MinIO, shared by every
+    # request in the process.
+    max_pool_connections: int = 10
+    # Cache parquet footers by ETag and only fetch the overlapping row groups.
+    cache_parquet_metadata: bool = True
+    # Optional local directory caching whole MinIO objects, validated by ETag
+    # and trimmed least recently used first to disk_cache_max_bytes.
+    disk_cache_path: Optional[str] = None
+    disk_cache_max_bytes: int = 10 * 1024**3
+    # Hive partition key holding the event date (e.g. date=2026-10-17), used
+    # to skip partitions outside the requested time range.
+    date_partition_key: str = "date"
+    # Upper bound on files of a multi-file source read at the same time.
+    max_concurrent_reads: int = 8
+    # Upper bound on feature views of one request fetched at the same time.
+    max_concurrent_feature_views: int = 8
+    # Upper bound on async requests served at the same time per event loop.
+    max_concurrent_async_requests: int = 64
+
+
+class PolarsRetrievalMetadata(RetrievalMetadata):
+    """
+    Retrieval metadata that also carries the request's `RequestMetrics`,
+    which keep accumulating while the job's plan is run and converted.
+    """
+
+    def __init__(
+        self,
+        features: List[str],
+        keys: List[str],
+        min_event_timestamp: Optional[datetime] = None,
+        max_event_timestamp: Optional[datetime] = None,
+        metrics: Optional[RequestMetrics] = None,
+    ):
+        super().__init__(features, keys, min_event_timestamp, max_event_timestamp)
+        self.metrics = metrics or RequestMetrics("retrieval")
 
 
 class CustomRetrievalJob(RetrievalJob):
-    def __init__(self, dataframe: pl.DataFrame):
-        self.dataframe = dataframe
+    """
+    A retrieval job backed by a polars query plan.  `to_df` and `to_arrow`
+    return pandas and arrow like every other offline store, through Feast's
+    own handling of on demand feature views and validation; `to_polars`
+    returns the polars result as it is.  `to_arrow_batches` runs the plan on
+    the streaming engine so large results can be consumed in batches.
 
-    def to_df(self):
-        return self.dataframe
+    The request's timings, bytes read, row counts and memory use are kept
+    in `metrics` (also `metadata.metrics`); running the plan adds the
+    `execute` and `convert` stages and the `rows_out` counter to them.
+    """
 
-    def to_arrow(self):
-        return self.dataframe.to_arrow()
+    def __init__(
+        self,
+        query: Union[pl.LazyFrame, pl.DataFrame],
+        config: RepoConfig,
+        full_feature_names: bool = False,
+        on_demand_feature_views: Optional[List[OnDemandFeatureView]] = None,
+        metadata: Optional[RetrievalMetadata] = None,
+    ):
+        self.query = query.lazy()
+        self.config = config
+        self._full_feature_names = full_feature_names
+        self._on_demand_feature_views = on_demand_feature_views or []
+        self._metadata = metadata
+        self._metrics = getattr(metadata, "metrics", None) or RequestMetrics(
+            "retrieval"
+        )
+
+    @property
+    def metrics(self) -> RequestMetrics:
+        return self._metrics
+
+    def to_polars(self, streaming: bool = False) -> pl.DataFrame:
+        """
+        Runs the query plan and returns the result as a polars DataFrame.
+
+        :param streaming: Run the plan on polars' streaming engine, which
+            processes the sources in batches instead of loading them whole.
+        """
+        with self._metrics.stage("execute"):
+            df = self.query.collect(engine="streaming" if streaming else "auto")
+        self._metrics.count("rows_out", df.height)
+        return df
+
+    async def to_polars_async(self, streaming: bool = False) -> pl.DataFrame:
+        """
+        Like `to_polars`, but runs the plan on polars' thread pool and awaits
+        the result, so an event loop keeps serving other requests meanwhile.
+        Running the plan takes one of the loop's `max_concurrent_async_requests`
+        slots.
+        """
+        async with _async_request_slots(self.config):
+            with self._metrics.stage("execute"):
+                df = await self.query.collect_async(
+                    engine="streaming" if streaming else "auto"
+                )
+        self._metrics.count("rows_out", df.height)
+        return df
 
-    def _to_arrow_internal(self):
-        # TODO: Implement this method
-        pass
+    def to_arrow_batches(self, batch_size: int = 65536) -> Iterator[pa.RecordBatch]:
+        """
+        Streams the result as arrow record batches of roughly `batch_size`
+        rows, so only a batch at a time has to be held in memory.
+
+        Memory is only constant when polars scans the sources itself.  MinIO
+        sources read through the footer cache (`cache_parquet_metadata`, the
+        default) or the disk cache are read into memory whole when the job
+        is created, and only the join and the output are streamed.
+
+        :param batch_size: The target number of rows per batch.
+        """
+        for df in self.query.collect_batches(chunk_size=batch_size, engine="streaming"):
+            self._metrics.count("rows_out", df.height)
+            yield from df.to_arrow().to_batches()
 
-    def _to_df_internal(self):
-        # TODO: Implement this method
-        pass
+    def _to_arrow_internal(self, timeout: Optional[int] = None) -> pa.Table:
+        df = self.to_polars()
+        with self._metrics.stage("convert"):
+            return df.to_arrow()
+
+    def _to_df_internal(self, timeout: Optional[int] = None) -> pd.DataFrame:
+        df = self.to_polars()
+        with self._metrics.stage("convert"):
+            return df.to_pandas()
 
     @property
-    def full_feature_names(self):
-        # TODO: Implement this property
-        pass
+    def full_feature_names(self) -> bool:
+        return self._full_feature_names
 
     @property
-    def metadata(self):
-        # TODO: Implement this property
-        pass
+    def metadata(self) -> Optional[RetrievalMetadata]:
+        return self._metadata
 
     @property
-    def on_demand_feature_views(self):
-        # TODO: Implement this property
-        pass
+    def on_demand_feature_views(self) -> List[OnDemandFeatureView]:
+        return self._on_demand_feature_views
 
-    def persist(self):
-        # TODO: Implement this method
-        pass
+    def persist(
+        self,
+        storage: SavedDatasetStorage,
+        allow_overwrite: bool = False,
+        timeout: Optional[int] = None,
+        rows_per_file: int = 1_000_000,
+        row_group_size: int = 65536,
+        max_workers: int = 8,
+    ):
+        """
+        Streams the result into a directory of parquet part files on local
+        disk or MinIO.  Parts are encoded and uploaded in parallel, large
+        parts as multipart uploads, and are written with column statistics
+        so later reads can prune row groups.
+
+        :param storage: A SavedDatasetFileStorage naming the target directory.
+        :param allow_overwrite: Replace the directory if it already exists.
+        :param rows_per_file: The target number of rows in each part file.
+        :param row_group_size: The number of rows in each parquet row group.
+        :param max_workers: The number of parts encoded and uploaded at once,
+            which also bounds how many parts are held in memory.
+        """
+        if not isinstance(storage, SavedDatasetFileStorage):
+            raise ValueError(
+                f"PolarsOfflineStore can only persist to SavedDatasetFileStorage, "
+                f"got {type(storage).__name__}."
+            )
+
+        path = storage.file_options.uri
+        if path.startswith("s3://"):
+            fs = _s3_filesystem(self.config)
+            root = path[len("s3://") :].rstrip("/")
+        else:
+            fs = fsspec.filesystem("file")
+            root = path.rstrip("/")
+
+        if fs.exists(root):
+            if not allow_overwrite:
+                raise SavedDatasetLocationAlreadyExists(location=path)
+            fs.rm(root, recursive=True)
+        fs.makedirs(root, exist_ok=True)
+
+        def write_part(index: int, df: pl.DataFrame):
+            buffer = pa.BufferOutputStream()
+            pq.write_table(
+                df.to_arrow(),
+                buffer,
+                row_group_size=row_group_size,
+                compression="zstd",
+                write_statistics=True,
+            )
+            fs.pipe_file(
+                f"{root}/part-{index:05d}.parquet", buffer.getvalue().to_pybytes()
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            index = -1
+            for index, df in enumerate(
+                self.query.collect_batches(chunk_size=rows_per_file, engine="streaming")
+            ):
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(write_part, index, df))
+
+            if index < 0:
+                # Keep the schema around even when the result is empty.
+                pending.add(
+                    executor.submit(
+                        write_part, 0, pl.DataFrame(schema=self.query.collect_schema())
+                    )
+                )
+            for future in pending:
+                future.result()
 
 
 class PolarsOfflineStore(OfflineStore):
     def __init__(self):
         super().__init__()
 
+    @staticmethod
     def pull_all_from_table_or_query(
         config: RepoConfig,
         data_source: DataSource,
-        entity_names: Optional[Dict[str, Any]],
-        feature_view: FeatureView,
-        full_feature_names: bool = False,
+        join_key_columns: List[str],
+        feature_name_columns: List[str],
+        timestamp_field: str,
+        created_timestamp_column: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
     ) -> RetrievalJob:
         """
-        Retrieve a full dataset from the specified data source.
+        Retrieve every row of the data source inside [start_date, end_date).
         """
         try:
-            s3 = s3fs.S3FileSystem(
-                client_kwargs={
-                    "endpoint_url": config.offline_store.minio_endpoint,
-                    "aws_access_key_id": s3_access_key,
-                    "aws_secret_access_key": s3_secret_key,
-                }
+            metrics = RequestMetrics("pull_all_from_table_or_query")
+            columns = _pull_all_columns(
+                join_key_columns,
+                feature_name_columns,
+                timestamp_field,
+                created_timestamp_column,
+            )
+            feature_lf = _scan_window(
+                config,
+                data_source.path,
+                columns,
+                timestamp_field,
+                start_date,
+                end_date,
+                metrics,
             )
 
-            # Construct the file path for the feature view data
-            bucket_name = data_source.path.split("/")[2]
-            file_path = "/".join(data_source.path.split("/")[3:])
-            full_path = f"{bucket_name}/{file_path}"
+            return CustomRetrievalJob(
+                feature_lf,
+                config,
+                metadata=PolarsRetrievalMetadata(
+                    features=feature_name_columns,
+                    keys=join_key_columns,
+                    metrics=metrics,
+                ),
+            )
 
-            # Read the Parquet file
-            with s3.open(full_path, "rb") as f:
-                feature_df = pl.read_parquet(f)
+        except Exception as e:
+            logging.error(f"Error in pull_all_from_table_or_query: {str(e)}")
+            raise
 
-            # Process and filter the data as necessary for your application
-            # This might involve filtering based on entity_names, handling full_feature_names, etc.
+    @staticmethod
+    async def pull_all_from_table_or_query_async(
+        config: RepoConfig,
+        data_source: DataSource,
+        join_key_columns: List[str],
+        feature_name_columns: List[str],
+        timestamp_field: str,
+        created_timestamp_column: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> RetrievalJob:
+        """
+        The asynchronous counterpart of `pull_all_from_table_or_query`.
+        """
+        try:
+            async with _async_request_slots(config):
+                metrics = RequestMetrics("pull_all_from_table_or_query")
+                columns = _pull_all_columns(
+                    join_key_columns,
+                    feature_name_columns,
+                    timestamp_field,
+                    created_timestamp_column,
+                )
+                feature_lf = await _scan_window_async(
+                    config,
+                    data_source.path,
+                    columns,
+                    timestamp_field,
+                    start_date,
+                    end_date,
+                    metrics,
+                )
 
-            return CustomRetrievalJob(feature_df)
+                return CustomRetrievalJob(
+                    feature_lf,
+                    config,
+                    metadata=PolarsRetrievalMetadata(
+                        features=feature_name_columns,
+                        keys=join_key_columns,
+                        metrics=metrics,
+                    ),
+                )
 
         except Exception as e:
-            logging.error(f"Error in pull_all_from_table_or_query: {str(e)}")
+            logging.error(f"Error in pull_all_from_table_or_query_async: {str(e)}")
             raise
 
+    @staticmethod
     def pull_latest_from_table_or_query(
-        self,
         config: RepoConfig,
         data_source: DataSource,
-        entity_names: Optional[Dict[str, Any]],
-        feature_view: FeatureView,
+        join_key_columns: List[str],
+        feature_name_columns: List[str],
         timestamp_field: str,
         created_timestamp_column: Optional[str],
+        start_date: datetime,
+        end_date: datetime,
     ) -> RetrievalJob:
         """
-        Retrieve the latest data from the specified data source.
+        Retrieve the latest row per entity among the rows written inside
+        [start_date, end_date).
+
+        `feast materialize-incremental` passes the end of the previous
+        materialization as `start_date`, so that watermark bounds the scan:
+        row groups whose timestamp statistics fall before it are never read
+        and the cost of each run follows the size of the delta.
         """
         try:
-            s3 = s3fs.S3FileSystem(
-                client_kwargs={
-                    "endpoint_url": config.offline_store.minio_endpoint,
-                    "aws_access_key_id": s3_access_key,
-                    "aws_secret_access_key": s3_secret_key,
-                }
-            )
+            metrics = RequestMetrics("pull_latest_from_table_or_query")
+            sort_columns = [timestamp_field]
+            if created_timestamp_column:
+                sort_columns.append(created_timestamp_column)
 
-            # Construct the file path for the feature view data
-            bucket_name = data_source.path.split("/")[2]
-            file_path = "/".join(data_source.path.split("/")[3:])
-            full_path = f"{bucket_name}/{file_path}"
+            feature_lf = _scan_window(
+                config,
+                data_source.path,
+                join_key_columns + feature_name_columns + sort_columns,
+                timestamp_field,
+                start_date,
+                end_date,
+                metrics,
+            )
 
-            # Read the Parquet file
-            with s3.open(full_path, "rb") as f:
-                feature_df = pl.read_parquet(f)
+            latest_feature_lf = _latest_per_entity(
+                feature_lf, join_key_columns, timestamp_field, created_timestamp_column
+            )
 
-            # Apply any necessary filters to get the latest data
-            # Assuming your timestamp_field is a datetime column in your dataset
-            # You might need to adjust this logic based on your specific data structure
-            latest_feature_df = feature_df.sort(timestamp_field, reverse=True).unique(
-                subset=entity_names.keys()
+            return CustomRetrievalJob(
+                latest_feature_lf,
+                config,
+                metadata=PolarsRetrievalMetadata(
+                    features=feature_name_columns,
+                    keys=join_key_columns,
+                    min_event_timestamp=start_date,
+                    max_event_timestamp=end_date,
+                    metrics=metrics,
+                ),
             )
 
-            # Optionally, handle the created_timestamp_column
-            # This would depend on how your data is structured and how you want to handle it
+        except Exception as e:
+            logging.error(f"Error in pull_latest_from_table_or_query: {str(e)}")
+            raise
 
-            return CustomRetrievalJob(latest_feature_df)
+    @staticmethod
+    async def pull_latest_from_table_or_query_async(
+        config: RepoConfig,
+        data_source: DataSource,
+        join_key_columns: List[str],
+        feature_name_columns: List[str],
+        timestamp_field: str,
+        created_timestamp_column: Optional[str],
+        start_date: datetime,
+        end_date: datetime,
+    ) -> RetrievalJob:
+        """
+        The asynchronous counterpart of `pull_latest_from_table_or_query`.
+        """
+        try:
+            async with _async_request_slots(config):
+                metrics = RequestMetrics("pull_latest_from_table_or_query")
+                sort_columns = [timestamp_field]
+                if created_timestamp_column:
+                    sort_columns.append(created_timestamp_column)
+
+                feature_lf = await _scan_window_async(
+                    config,
+                    data_source.path,
+                    join_key_columns + feature_name_columns + sort_columns,
+                    timestamp_field,
+                    start_date,
+                    end_date,
+                    metrics,
+                )
+
+                latest_feature_lf = _latest_per_entity(
+                    feature_lf,
+                    join_key_columns,
+                    timestamp_field,
+                    created_timestamp_column,
+                )
+
+                return CustomRetrievalJob(
+                    latest_feature_lf,
+                    config,
+                    metadata=PolarsRetrievalMetadata(
+                        features=feature_name_columns,
+                        keys=join_key_columns,
+                        min_event_timestamp=start_date,
+                        max_event_timestamp=end_date,
+                        metrics=metrics,
+                    ),
+                )
 
         except Exception as e:
-            logging.error(f"Error in pull_latest_from_table_or_query: {str(e)}")
+            logging.error(f"Error in pull_latest_from_table_or_query_async: {str(e)}")
             raise
 
     # @staticmethod
@@ -156,56 +1220,125 @@ class PolarsOfflineStore(OfflineStore):
         config: RepoConfig,
         feature_views: List[FeatureView],
         feature_refs: List[str],
-        entity_df: Union[pl.DataFrame, str],
+        entity_df: Union[pl.DataFrame, pd.DataFrame, pa.Table, str],
         registry: Registry,
         project: str,
         full_feature_names: bool = False,
     ) -> RetrievalJob:
         try:
-            s3 = s3fs.S3FileSystem(
-                client_kwargs={
-                    "endpoint_url": config.offline_store.minio_endpoint,
-                    "aws_access_key_id": s3_access_key,
-                    "aws_secret_access_key": s3_secret_key,
-                }
+            metrics = RequestMetrics("get_historical_features")
+            with metrics.stage("entity_df"):
+                entity_df, min_timestamp, max_timestamp, entity_keys = (
+                    _prepare_entity_frame(
+                        _entity_frame(config, entity_df, feature_views), feature_views
+                    )
+                )
+            metrics.count("entity_rows", entity_df.height)
+
+            with metrics.stage("registry"):
+                feature_index = _feature_ref_index(feature_refs)
+
+            # Fetch and prepare the feature views concurrently, so the object
+            # store round trips of a multi-view request overlap and its latency
+            # follows the slowest view instead of the sum of all of them.
+            with ThreadPoolExecutor(
+                max_workers=config.offline_store.max_concurrent_feature_views
+            ) as executor:
+                feature_lfs = list(
+                    executor.map(
+                        lambda fv: _prepare_feature_view(
+                            config,
+                            fv,
+                            feature_index.get(fv.name, []),
+                            entity_df,
+                            min_timestamp,
+                            max_timestamp,
+                            full_feature_names,
+                            metrics,
+                        ),
+                        feature_views,
+                    )
+                )
+
+            return _join_feature_views(
+                config,
+                entity_df,
+                entity_keys,
+                feature_views,
+                feature_lfs,
+                feature_refs,
+                min_timestamp,
+                max_timestamp,
+                full_feature_names,
+                metrics,
             )
 
-            combined_feature_df = pl.DataFrame()
-            for fv in feature_views:
-                # with s3.open(full_path, "rb") as f:
-                feature_df = pl.read_parquet(fv.batch_source.path)
-
-                selected_features = [
-                    ref.split(":")[1]
-                    for ref in feature_refs
-                    if ref.startswith(fv.name + ":")
-                ]
-
-                if full_feature_names:
-                    feature_df = feature_df.select([fv.entities[0]] + selected_features)
-                    feature_df.columns = [
-                        fv.name + "__" + col if col in selected_features else col
-                        for col in feature_df.columns
-                    ]
-                else:
-                    feature_df = feature_df.select([fv.entities[0]] + selected_features)
-
-                if combined_feature_df.height == 0:
-                    combined_feature_df = feature_df
-                else:
-                    combined_feature_df = combined_feature_df.join(
-                        feature_df, on=fv.entities[0], how="outer"
+        except Exception as e:
+            logging.error(f"Error in get_historical_features: {str(e)}")
+            raise
+
+    async def get_historical_features_async(
+        self,
+        config: RepoConfig,
+        feature_views: List[FeatureView],
+        feature_refs: List[str],
+        entity_df: Union[pl.DataFrame, pd.DataFrame, pa.Table, str],
+        registry: Registry,
+        project: str,
+        full_feature_names: bool = False,
+    ) -> RetrievalJob:
+        """
+        The asynchronous counterpart of `get_historical_features`, for feature
+        servers running on an event loop.  MinIO reads are awaited on the
+        loop instead of holding a thread each, the feature views are fetched
+        concurrently, and cancelling the calling task stops any GETs still
+        outstanding.  Use `to_polars_async` on the returned job to run the
+        plan without blocking the loop.
+        """
+        try:
+            async with _async_request_slots(config):
+                metrics = RequestMetrics("get_historical_features")
+                with metrics.stage("entity_df"):
+                    entity_df, min_timestamp, max_timestamp, entity_keys = (
+                        _prepare_entity_frame(
+                            await _entity_frame_async(config, entity_df, feature_views),
+                            feature_views,
+                        )
                     )
+                metrics.count("entity_rows", entity_df.height)
+
+                with metrics.stage("registry"):
+                    feature_index = _feature_ref_index(feature_refs)
 
-            if isinstance(entity_df, pl.DataFrame):
-                result_df = entity_df.join(
-                    combined_feature_df, on=feature_views[0].entities[0], how="left"
+                feature_lfs = await asyncio.gather(
+                    *[
+                        _prepare_feature_view_async(
+                            config,
+                            fv,
+                            feature_index.get(fv.name, []),
+                            entity_df,
+                            min_timestamp,
+                            max_timestamp,
+                            full_feature_names,
+                            metrics,
+                        )
+                        for fv in feature_views
+                    ]
                 )
-            else:
-                raise NotImplementedError("SQL query handling is not implemented.")
 
-            return CustomRetrievalJob(result_df)
+                return _join_feature_views(
+                    config,
+                    entity_df,
+                    entity_keys,
+                    feature_views,
+                    feature_lfs,
+                    feature_refs,
+                    min_timestamp,
+                    max_timestamp,
+                    full_feature_names,
+                    metrics,
+                )
 
         except Exception as e:
-            logging.error(f"Error in get_historical_features: {str(e)}")
+            logging.error(f"Error in get_historical_features_async: {str(e)}")
             raise
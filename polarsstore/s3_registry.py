@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import s3fs
+
+# One S3FileSystem per (endpoint, credentials, pool size) for the whole
+# process.  Each filesystem owns a botocore client with a keep-alive
+# connection pool, so reusing it saves the TCP/TLS handshake and client
+# setup on every offline store call.
+_filesystems: Dict[Tuple, s3fs.S3FileSystem] = {}
+_lock = threading.Lock()
+
+# Asynchronous filesystems are bound to the event loop that opened their
+# session, so they are shared per loop rather than per process.
+_async_filesystems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _reset_after_fork():
+    """
+    Drop clients inherited from the parent process.  Their sockets and event
+    loop belong to the parent, so a forked worker has to build its own.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _filesystems.clear()
+    _async_filesystems.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_s3_filesystem(
+    endpoint_url: Optional[str],
+    access_key: Optional[str],
+    secret_key: Optional[str],
+    max_pool_connections: int = 10,
+) -> s3fs.S3FileSystem:
+    """
+    Returns the shared S3FileSystem for an endpoint and set of credentials,
+    creating it on first use.
+
+    :param endpoint_url: The S3/MinIO endpoint URL.
+    :param access_key: The AWS access key id.
+    :param secret_key: The AWS secret access key.
+    :param max_pool_connections: The maximum number of pooled keep-alive
+        connections the underlying client may hold open.
+
+    :return: A filesystem that is safe to share between threads.
+    """
+    key = (endpoint_url, access_key, secret_key, max_pool_connections)
+    with _lock:
+        fs = _filesystems.get(key)
+        if fs is None:
+            fs = s3fs.S3FileSystem(
+                client_kwargs={
+                    "endpoint_url": endpoint_url,
+                    "aws_access_key_id": access_key,
+                    "aws_secret_access_key": secret_key,
+                },
+                config_kwargs={
+                    "max_pool_connections": max_pool_connections,
+                    "tcp_keepalive": True,
+                },
+                # The registry owns the instance lifetime, so bypass fsspec's
+                # own instance cache.
+                skip_instance_cache=True,
+            )
+            _filesystems[key] = fs
+        return fs
+
+
+async def get_async_s3_filesystem(
+    endpoint_url: Optional[str],
+    access_key: Optional[str],
+    secret_key: Optional[str],
+    max_pool_connections: int = 10,
+) -> s3fs.S3FileSystem:
+    """
+    Returns the shared asynchronous S3FileSystem of the running event loop
+    for an endpoint and set of credentials, opening its session on first
+    use.  Its `_`-prefixed coroutine methods never block the loop.
+
+    :param endpoint_url: The S3/MinIO endpoint URL.
+    :param access_key: The AWS access key id.
+    :param secret_key: The AWS secret access key.
+    :param max_pool_connections: The maximum number of pooled keep-alive
+        connections the underlying client may hold open.
+    """
+    loop = asyncio.get_running_loop()
+    filesystems = _async_filesystems.setdefault(loop, {})
+    key = (endpoint_url, access_key, secret_key, max_pool_connections)
+    fs = filesystems.get(key)
+    if fs is None:
+        fs = s3fs.S3FileSystem(
+            asynchronous=True,
+            loop=loop,
+            client_kwargs={
+                "endpoint_url": endpoint_url,
+                "aws_access_key_id": access_key,
+                "aws_secret_access_key": secret_key,
+            },
+            config_kwargs={
+                "max_pool_connections": max_pool_connections,
+                "tcp_keepalive": True,
+            },
+            skip_instance_cache=True,
+        )
+        await fs.set_session()
+        # Another task may have won the race while the session was opening.
+        fs = filesystems.setdefault(key, fs)
+    return fs
+
+
+def clear_s3_filesystems():
+    """
+    Forgets every shared filesystem, e.g. after rotating credentials.
+    """
+    with _lock:
+        _filesystems.clear()
+        _async_filesystems.clear()
@@ -0,0 +1,71 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from feast import Entity, FeatureStore, FeatureView, Field, FileSource, ValueType
+from feast.types import Float32
+
+# The offline store's modules import each other as top-level modules, as
+# they do when feast loads polarsofflinestore.PolarsOfflineStore from here
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FEATURE_STORE_YAML = """\
+project: polars_test
+registry: {repo}/registry.db
+provider: local
+online_store:
+    type: sqlite
+    path: {repo}/online_store.db
+offline_store:
+    type: polarsofflinestore.PolarsOfflineStore
+    minio_endpoint: http://localhost:9000
+    bucket_name: unused
+entity_key_serialization_version: 3
+"""
+
+
+def test_materialize_with_created_timestamp(tmp_path):
+    """`feast materialize` pulls every row and keeps, per entity, the row
+    with the latest event timestamp and then the latest created timestamp."""
+    (tmp_path / "feature_store.yaml").write_text(
+        FEATURE_STORE_YAML.format(repo=tmp_path)
+    )
+    event_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    pd.DataFrame(
+        {
+            "example_id": [1, 1, 2],
+            "event_timestamp": [event_time] * 3,
+            "created": [
+                event_time,
+                event_time + timedelta(hours=1),
+                event_time,
+            ],
+            "col_1": [1.0, 2.0, 3.0],
+        }
+    ).astype({"col_1": "float32"}).to_parquet(tmp_path / "data.parquet")
+
+    example = Entity(
+        name="example_id", join_keys=["example_id"], value_type=ValueType.INT64
+    )
+    feature_view = FeatureView(
+        name="created_feature_view",
+        entities=[example],
+        schema=[Field(name="col_1", dtype=Float32)],
+        source=FileSource(
+            path=str(tmp_path / "data.parquet"),
+            timestamp_field="event_timestamp",
+            created_timestamp_column="created",
+        ),
+        ttl=timedelta(days=1),
+    )
+    store = FeatureStore(repo_path=str(tmp_path))
+    store.apply([example, feature_view])
+
+    store.materialize(event_time - timedelta(days=1), event_time + timedelta(days=1))
+
+    values = store.get_online_features(
+        features=["created_feature_view:col_1"],
+        entity_rows=[{"example_id": 1}, {"example_id": 2}],
+    ).to_dict()
+    assert values["col_1"] == [2.0, 3.0]
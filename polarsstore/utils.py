@@ -1,8 +1,8 @@
-import pandas as pd
 import numpy as np
 import pyarrow as pa
 import pyarrow.parquet as pq
 from datetime import datetime, timedelta
+from typing import Iterator
 
 from datetime import timedelta
 from feast import Entity, FeatureView, FileSource, Field, ValueType
@@ -10,12 +10,56 @@ import s3fs
 from feast.repo_config import RepoConfig
 from feast.types import Int64
 import os
+import sys
 import time
 
+# The registry apply cache is shared with the other feature repos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmark.registry_cache import apply_definitions, get_feature_store
+
 s3_access_key = os.environ.get("AWS_ACCESS_KEY_ID")
 s3_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
 minio_endpoint = os.environ.get("FEAST_S3_ENDPOINT_URL")
 
+# Upper bound on the in-memory size of one generated row group for the
+# profiles that bound it, and the part size of the multipart upload the row
+# groups are streamed through.
+ROW_GROUP_BYTES = 64 * 1024**2
+MULTIPART_CHUNK_SIZE = 16 * 1024**2
+# pyarrow's default number of rows per row group.
+DEFAULT_ROW_GROUP_SIZE = 1024**2
+
+# Named pyarrow writer settings for create_parquet_file.  "default" keeps the
+# pyarrow defaults (snappy, dictionary encoding, int64 columns) as the
+# baseline the others are compared against.  The others also cap each row
+# group at `row_group_bytes`, so wide tables are written in small pieces.
+# "compact" also narrows the feature columns and adds a bloom filter on the
+# `id` join key.
+WRITER_PROFILES = {
+    "default": {},
+    "zstd": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "write_page_index": True,
+        "row_group_bytes": ROW_GROUP_BYTES,
+    },
+    "lz4": {
+        "compression": "lz4",
+        "write_page_index": True,
+        "row_group_bytes": ROW_GROUP_BYTES,
+    },
+    "compact": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 65536,
+        "row_group_bytes": ROW_GROUP_BYTES,
+        "write_page_index": True,
+        "downcast": True,
+        "bloom_filter_columns": ["id"],
+    },
+}
+
 
 def generate_feast_repository_definitions(num_columns, parquet_file_path):
     """
@@ -56,35 +100,106 @@ def generate_feast_repository_definitions(num_columns, parquet_file_path):
     return [dummy_entity, dummy_source, dummy_fv]
 
 
+def smallest_integer_type(low: int, high: int) -> np.dtype:
+    """
+    The narrowest signed integer type that holds every value in [low, high].
+    """
+    for candidate in (np.int8, np.int16, np.int32):
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return np.dtype(candidate)
+    return np.dtype(np.int64)
+
+
+def generate_row_groups(
+    num_columns: int,
+    num_rows: int,
+    row_group_size: int,
+    downcast: bool = False,
+) -> Iterator[pa.Table]:
+    """
+    Generates the random feature data one row group at a time, straight from
+    NumPy buffers.  Every column wraps a contiguous NumPy array without a
+    copy, and the timestamps are computed as one vectorized range, so no
+    Python code runs per row.
+
+    :param num_columns: Number of feature columns.
+    :param num_rows: Total number of rows across all row groups.
+    :param row_group_size: Number of rows in each generated table.
+    :param downcast: Store the feature columns in the narrowest integer type
+        that holds their values instead of int64.  `id` stays int64, the type
+        of the entity it is joined against.
+
+    :return: An iterator of tables with feature_1..feature_N, id and
+        event_timestamp columns.
+    """
+    feature_type = smallest_integer_type(0, 99) if downcast else np.dtype(np.int64)
+    names = [f"feature_{i}" for i in range(1, num_columns + 1)]
+    names += ["id", "event_timestamp"]
+    now = np.datetime64(datetime.now(), "ns")
+    rng = np.random.default_rng()
+
+    for start in range(0, num_rows, row_group_size):
+        stop = min(start + row_group_size, num_rows)
+        # One row per column, so every feature column is a contiguous slice
+        features = rng.integers(
+            0, 100, size=(num_columns, stop - start), dtype=feature_type
+        )
+        offsets = np.arange(start, stop, dtype=np.int64)
+        arrays = [pa.array(column) for column in features]
+        arrays.append(pa.array(offsets + 1))
+        arrays.append(pa.array(now - offsets.astype("timedelta64[m]")))
+        yield pa.Table.from_arrays(arrays, names=names)
+
+
 def create_parquet_file(
     num_columns: int,
     num_rows: int,
     bucket_name: str,
     repo_config: RepoConfig,
     s3_filepath: str,
+    profile: str = "default",
 ):
     """
     Creates a Parquet file with specified dimensions and uploads it to MinIO.
 
+    The data is generated, encoded and uploaded one row group at a time
+    through a multipart upload, and read back one row group at a time, so
+    peak memory stays around one row group however long the file.  Only the
+    profiles with a `row_group_bytes` cap bound that by size: the "default"
+    profile keeps pyarrow's DEFAULT_ROW_GROUP_SIZE rows per row group, so it
+    builds up to that many rows in memory at once (all of a 10,000 x 10,000
+    table, about 800 MB).
+
     :param num_columns: Number of columns in the DataFrame.
     :param num_rows: Number of rows in the DataFrame.
     :param bucket_name: MinIO bucket name.
     :param repo_config: Instance of RepoConfig containing MinIO configuration.
     :param s3_filepath: Path to save the Parquet file in MinIO.
-    """
+    :param profile: The name of the WRITER_PROFILES entry to write with.  Note
+        that downcasting profiles store the features in narrower types than
+        the Int64 the generated feature view declares.
 
-    # Create a DataFrame with random data
-    df = pd.DataFrame(
-        np.random.randint(0, 100, size=(num_rows, num_columns)),
-        columns=[f"feature_{i}" for i in range(1, num_columns + 1)],
-    )
-    df["id"] = np.arange(1, num_rows + 1)  # Adding a user_id column for entity
-    df["event_timestamp"] = [
-        datetime.now() - timedelta(minutes=i) for i in range(num_rows)
-    ]
+    :return: A dict with the profile, the size of the file in bytes and the
+        time in ms taken to generate and write it to, and read it back from,
+        MinIO.
+    """
+    options = dict(WRITER_PROFILES[profile])
+    downcast = options.pop("downcast", False)
+    bloom_filter_columns = options.pop("bloom_filter_columns", [])
+    if bloom_filter_columns:
+        options["bloom_filter_options"] = {
+            column: {"ndv": num_rows, "fpp": 0.01} for column in bloom_filter_columns
+        }
 
-    # Convert DataFrame to PyArrow Table
-    table = pa.Table.from_pandas(df)
+    row_group_size = options.pop("row_group_size", DEFAULT_ROW_GROUP_SIZE)
+    row_group_bytes = options.pop("row_group_bytes", None)
+    if row_group_bytes:
+        # Bound each row group by memory as well as rows, so wide tables still
+        # stream in small pieces
+        row_group_size = min(
+            row_group_size, max(1, row_group_bytes // (8 * (num_columns + 2)))
+        )
 
     begin = time.perf_counter_ns()
 
@@ -96,10 +211,34 @@ def create_parquet_file(
         }
     )
 
-    # Write Table to a Parquet file in MinIO
-    with fs.open(f"{bucket_name}/{s3_filepath}", "wb") as f:
-        pq.write_table(table, f)
+    # Write the row groups to a Parquet file in MinIO.  s3fs uploads a part
+    # every MULTIPART_CHUNK_SIZE bytes instead of buffering the whole file.
+    path = f"{bucket_name}/{s3_filepath}"
+    with fs.open(path, "wb", block_size=MULTIPART_CHUNK_SIZE) as f:
+        writer = None
+        for table in generate_row_groups(
+            num_columns, num_rows, row_group_size, downcast
+        ):
+            if writer is None:
+                writer = pq.ParquetWriter(f, table.schema, **options)
+            writer.write_table(table, row_group_size=row_group_size)
+        if writer is not None:
+            writer.close()
 
     end = time.perf_counter_ns()
 
-    return (end - begin) / 1_000_000
+    # Read it back to see what the layout costs the reader, one row group at
+    # a time and discarding each, so reading holds no more than writing did
+    read_begin = time.perf_counter_ns()
+    with fs.open(path, "rb") as f:
+        parquet_file = pq.ParquetFile(f)
+        for i in range(parquet_file.num_row_groups):
+            parquet_file.read_row_group(i)
+    read_end = time.perf_counter_ns()
+
+    return {
+        "profile": profile,
+        "size_bytes": fs.info(path)["size"],
+        "write_ms": (end - begin) / 1_000_000,
+        "read_ms": (read_end - read_begin) / 1_000_000,
+    }
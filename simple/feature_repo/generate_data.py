@@ -1,9 +1,32 @@
 import psycopg2
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# Binary COPY framing: the signature, flags and header extension length that
+# open the stream, and the field count of -1 that ends it.
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + np.array([0, 0], dtype=">i4").tobytes()
+PGCOPY_TRAILER = np.array([-1], dtype=">i2").tobytes()
+# Binary timestamps count microseconds from 2000-01-01.
+PG_EPOCH = datetime(2000, 1, 1)
+# Rows are encoded and sent in pieces of about this many bytes, so only one
+# piece per loader connection is held in encoded form at a time.
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+# The type OID of REAL, which binary arrays name for their elements.
+FLOAT4_OID = 700
+
+# Table layouts for the feature columns:
+# - "columns": one REAL column per feature in a single table.  A heap tuple
+#   has to fit in an 8KB page, so this tops out below 2,000 features.
+# - "groups": the features split into tables of FEATURE_GROUP_SIZE columns,
+#   named {table_name}_{group}, each keyed by the same example_id.
+# - "array": one table holding every feature in a packed `features REAL[]`
+#   column, stored out of line with no per-column tuple overhead.
+LAYOUTS = ("columns", "groups", "array")
+FEATURE_GROUP_SIZE = 1000
 
 # Retrieve database credentials from environment variables
 user = os.getenv("PG_USERNAME")
@@ -16,11 +39,53 @@ if not user or not password:
 # Example: kubectl port-forward svc/postgresql 5432:5432
 
 
-def create_table(cur, table_name, num_features):
+def feature_groups(num_features, group_size=FEATURE_GROUP_SIZE):
+    """The [start, stop) feature index ranges of the "groups" and "array"
+    layouts' feature groups."""
+    return [
+        (start, min(start + group_size, num_features))
+        for start in range(0, num_features, group_size)
+    ]
+
+
+def create_table(
+    cur, table_name, num_features, layout="columns", group_size=FEATURE_GROUP_SIZE
+):
+    """Creates the table(s) of a layout, dropping any previous ones.
+
+    :return tables: The (table name, first feature, last feature + 1) of
+        each table holding feature columns, in feature order.
+    """
+    if layout == "groups":
+        tables = []
+        for group, (start, stop) in enumerate(feature_groups(num_features, group_size)):
+            group_table = f"{table_name}_{group}"
+            columns = ", ".join([f"col_{i+1} REAL" for i in range(start, stop)])
+            cur.execute(f"DROP TABLE IF EXISTS {group_table}")
+            cur.execute(
+                f"CREATE TABLE {group_table} ("
+                f"example_id INTEGER PRIMARY KEY, "
+                f"event_timestamp TIMESTAMP NOT NULL, {columns})"
+            )
+            tables.append((group_table, start, stop))
+        return tables
+
     # Drop the table if it exists
     drop_table_sql = f"DROP TABLE IF EXISTS {table_name}"
     cur.execute(drop_table_sql)
 
+    if layout == "array":
+        cur.execute(
+            f"CREATE TABLE {table_name} ("
+            f"example_id SERIAL PRIMARY KEY, event_timestamp TIMESTAMP NOT NULL, "
+            f"features REAL[] NOT NULL)"
+        )
+        # Random floats do not compress, so skip the attempt.
+        cur.execute(
+            f"ALTER TABLE {table_name} ALTER COLUMN features SET STORAGE EXTERNAL"
+        )
+        return [(table_name, 0, num_features)]
+
     # Construct the SQL for table creation
     columns = ", ".join([f"col_{i+1} REAL" for i in range(num_features)])
     create_table_sql = (
@@ -28,17 +93,168 @@ def create_table(cur, table_name, num_features):
         f"example_id SERIAL PRIMARY KEY, event_timestamp TIMESTAMP NOT NULL, {columns})"
     )
     cur.execute(create_table_sql)
+    return [(table_name, 0, num_features)]
+
+
+def copy_row_dtype(num_features, with_id=False, packed=False):
+    """The layout of one binary COPY tuple of ([example_id,] event_timestamp,
+    col_1, ... col_n): a field count, then a length and a big-endian value
+    per field.  `packed` tuples hold the features in one REAL[] field, whose
+    value is a dimension header followed by a length and value per element.
+    """
+    fields = [("field_count", ">i2")]
+    if with_id:
+        fields += [("id_length", ">i4"), ("id", ">i4")]
+    fields += [("timestamp_length", ">i4"), ("timestamp", ">i8")]
+    if packed:
+        fields += [("array_length", ">i4"), ("array_header", ">i4", (5,))]
+    fields.append(("features", [("length", ">i4"), ("value", ">f4")], (num_features,)))
+    return np.dtype(fields)
+
+
+def encode_copy_rows(data, timestamp_us, first_id=None, packed=False):
+    """Encodes rows of feature values as binary COPY tuples, straight from
+    the NumPy buffer without any text formatting.
+
+    :param first_id: The example_id of the first row, if ids are written.
+    :param packed: Encode the features as one REAL[] field.
+    """
+    num_rows, num_features = data.shape
+    with_id = first_id is not None
+    rows = np.empty(num_rows, dtype=copy_row_dtype(num_features, with_id, packed))
+    rows["field_count"] = (1 if packed else num_features) + 1 + with_id
+    if with_id:
+        rows["id_length"] = 4
+        rows["id"] = np.arange(first_id, first_id + num_rows)
+    rows["timestamp_length"] = 8
+    rows["timestamp"] = timestamp_us
+    if packed:
+        # ndim, has-nulls flag, element type, then length and lower bound
+        rows["array_length"] = 20 + 8 * num_features
+        rows["array_header"] = [1, 0, FLOAT4_OID, num_features, 1]
+    rows["features"]["length"] = 4
+    rows["features"]["value"] = data
+    return rows.tobytes()
+
+
+class BinaryCopyStream:
+    """A file-like object that yields a binary COPY stream of `data` one
+    chunk at a time, for `cursor.copy_expert`."""
+
+    def __init__(self, data, timestamp_us, chunk_rows, first_id=None, packed=False):
+        self.data = data
+        self.timestamp_us = timestamp_us
+        self.chunk_rows = chunk_rows
+        self.first_id = first_id
+        self.packed = packed
+        self._pieces = self._generate()
+        self._buffer = memoryview(b"")
+
+    def _generate(self):
+        yield PGCOPY_HEADER
+        for start in range(0, len(self.data), self.chunk_rows):
+            yield encode_copy_rows(
+                self.data[start : start + self.chunk_rows],
+                self.timestamp_us,
+                None if self.first_id is None else self.first_id + start,
+                self.packed,
+            )
+        yield PGCOPY_TRAILER
+
+    def read(self, size=-1):
+        if not self._buffer:
+            self._buffer = memoryview(next(self._pieces, b""))
+        if size is None or size < 0:
+            size = len(self._buffer)
+        piece, self._buffer = self._buffer[:size], self._buffer[size:]
+        return piece.tobytes()
+
+
+def copy_binary(
+    db_params,
+    table_name,
+    data,
+    timestamp,
+    chunk_rows=None,
+    first_feature=0,
+    first_id=None,
+    packed=False,
+):
+    """Loads rows into the table over one connection with
+    `COPY ... FROM STDIN WITH BINARY`, in chunks of `chunk_rows` rows.
+
+    :param first_feature: The index of the feature in the first column of
+        `data`, as the columns of a feature group start part way through.
+    :param first_id: The example_id of the first row, if the ids are written
+        rather than drawn from the table's serial sequence.
+    :param packed: Load the features into the `features REAL[]` column.
+    """
+    num_features = data.shape[1]
+    with_id = first_id is not None
+    if chunk_rows is None:
+        row_bytes = copy_row_dtype(num_features, with_id, packed).itemsize
+        chunk_rows = max(1, COPY_CHUNK_BYTES // row_bytes)
+    timestamp_us = (timestamp - PG_EPOCH) // timedelta(microseconds=1)
+    columns = ["example_id"] if with_id else []
+    columns.append("event_timestamp")
+    if packed:
+        columns.append("features")
+    else:
+        columns += [
+            f"col_{i+1}" for i in range(first_feature, first_feature + num_features)
+        ]
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH BINARY",
+                BinaryCopyStream(data, timestamp_us, chunk_rows, first_id, packed),
+                size=COPY_CHUNK_BYTES,
+            )
+        conn.commit()
+    finally:
+        conn.close()
 
 
 # Define the function to generate and insert data into PostgreSQL
-def generate_data(db_params, table_name, num_rows, num_features):
+def generate_data(
+    db_params,
+    table_name,
+    num_rows,
+    num_features,
+    loader="binary",
+    workers=1,
+    chunk_rows=None,
+    layout="columns",
+    group_size=FEATURE_GROUP_SIZE,
+):
+    """Generates random feature rows and loads them into a new table.
+
+    :param loader: "binary" streams `COPY ... WITH BINARY` encoded straight
+        from the NumPy buffer; "csv" formats the whole frame as CSV text first.
+    :param workers: The number of parallel binary loader connections, each
+        copying a disjoint range of the rows with its own explicit ids, so
+        row i has example_id i + 1 whatever the number of workers.
+    :param chunk_rows: The rows per binary COPY chunk; by default as many as
+        fit in COPY_CHUNK_BYTES.
+    :param layout: One of LAYOUTS; "groups" and "array" hold feature views
+        too wide for one row of REAL columns and need the binary loader.
+    :param group_size: The features per table of the "groups" layout.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    if layout != "columns" and loader != "binary":
+        raise ValueError(f"The {layout} layout needs the binary loader")
+
     # Generate random float data
     data = np.random.rand(num_rows, num_features)
 
     # Convert to a Pandas DataFrame
     df = pd.DataFrame(data, columns=[f"col_{i+1}" for i in range(num_features)])
     # Add a timestamp column with the current time for all rows
-    df["event_timestamp"] = pd.Timestamp(datetime.now())
+    timestamp = datetime.now()
+    df["event_timestamp"] = pd.Timestamp(timestamp)
 
     # Calculate the size of the data in megabytes
     data_size_bytes = df.memory_usage(index=True).sum()
@@ -49,9 +265,42 @@ def generate_data(db_params, table_name, num_rows, num_features):
     cur = conn.cursor()
 
     # Create table if it doesn't exist
-    create_table(cur, table_name, num_features)
+    tables = create_table(cur, table_name, num_features, layout, group_size)
     conn.commit()
 
+    if loader == "binary":
+        cur.close()
+        conn.close()
+        bounds = np.linspace(0, num_rows, workers + 1, dtype=int)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                loads = [
+                    executor.submit(
+                        copy_binary,
+                        db_params,
+                        table,
+                        data[start:stop, first_feature:stop_feature],
+                        timestamp,
+                        chunk_rows,
+                        first_feature,
+                        # Explicit ids: the workers would otherwise draw
+                        # interleaved ids from the shared serial sequence,
+                        # and group tables need their rows to line up
+                        start + 1,
+                        layout == "array",
+                    )
+                    for table, first_feature, stop_feature in tables
+                    for start, stop in zip(bounds[:-1], bounds[1:])
+                    if stop > start
+                ]
+                for load in loads:
+                    load.result()
+        except (Exception, psycopg2.DatabaseError) as error:
+            print("Error: %s" % error)
+            return 1
+        print("Data inserted using binary COPY FROM successfully.")
+        return data_size_mb, df
+
     # Create a buffer for the data
     buffer = StringIO()
     df.to_csv(buffer, header=False, index=False)
@@ -90,12 +339,14 @@ if __name__ == "__main__":
     }
     table_name = "perform_large"
     num_rows = 4096 * 10
-    # num_features = 20000 # I Hit the max row size limit of 8KB
-    num_features = 500
+    # A single row of REAL columns hits the 8KB row size limit well before
+    # 20000 features; use FEATURE_LAYOUT=groups or array for those.
+    num_features = int(os.getenv("NUM_FEATURES", 500))
+    layout = os.getenv("FEATURE_LAYOUT", "columns")
 
-    # Generate and insert data
+    # Generate and insert data, over four parallel binary COPY connections
     data_size_mb, entity_df = generate_data(
-        db_params, table_name, num_rows, num_features
+        db_params, table_name, num_rows, num_features, workers=4, layout=layout
     )
 
     print(f"Data size: {data_size_mb} MB")
@@ -1,17 +1,154 @@
 import os
 from datetime import timedelta
+from pathlib import Path
 from feast import FeatureStore, Entity, FeatureView, Feature, ValueType, Field
 from feast.infra.offline_stores.contrib.postgres_offline_store.postgres_source import (
     PostgreSQLSource,
 )
 from feast.types import Float32
 
+# Must match the group size generate_data.py loaded the "groups" or "array"
+# layout with.  Each group becomes its own feature view: Postgres caps a
+# query at 1664 result columns, so no single source can expose 20000.
+FEATURE_GROUP_SIZE = 1000
+
+# Feast's point-in-time join selects every requested feature of every view
+# in one final query, so reads of more features than this, leaving room for
+# the entity columns under the 1664 column cap, are split into batches.
+MAX_QUERY_FEATURES = 1600
+
+
+def feature_groups(num_features: int, group_size: int = FEATURE_GROUP_SIZE):
+    """
+    The [start, stop) feature index ranges of the feature groups, as in
+    generate_data.py.
+    """
+    return [
+        (start, min(start + group_size, num_features))
+        for start in range(0, num_features, group_size)
+    ]
+
+
+def feature_sources(
+    table_name: str,
+    num_features: int,
+    layout: str = "columns",
+    group_size: int = FEATURE_GROUP_SIZE,
+):
+    """
+    Generates the feature view name, source name, source query and feature
+    range of every feature view a table layout is read through.
+
+    Parameters:
+    - table_name: Table name the data was loaded into by generate_data.py
+    - num_features: Number of features in the table(s)
+    - layout: "columns", "groups" or "array", as in generate_data.py
+    - group_size: Number of features per feature view of the wide layouts
+    """
+    if layout == "columns":
+        return [
+            (
+                "offline_feature_view",
+                "feature_data_source",
+                f"SELECT * FROM {table_name}",
+                (0, num_features),
+            )
+        ]
+
+    sources = []
+    for group, (start, stop) in enumerate(feature_groups(num_features, group_size)):
+        if layout == "groups":
+            columns = ", ".join(f"col_{i+1}" for i in range(start, stop))
+            query = (
+                f"SELECT example_id, event_timestamp, {columns} "
+                f"FROM {table_name}_{group}"
+            )
+        elif layout == "array":
+            # Slice the group out of the packed array once per row, in a
+            # subquery OFFSET 0 keeps from being flattened, rather than
+            # detoasting the whole array again for every subscript.
+            columns = ", ".join(
+                f"features[{i - start + 1}] AS col_{i+1}" for i in range(start, stop)
+            )
+            query = (
+                f"SELECT example_id, event_timestamp, {columns} FROM ("
+                f"SELECT example_id, event_timestamp, "
+                f"features[{start + 1}:{stop}] AS features "
+                f"FROM {table_name} OFFSET 0) AS feature_group"
+            )
+        else:
+            raise ValueError(f"Unknown layout {layout!r}")
+        sources.append(
+            (
+                f"offline_feature_view_{group}",
+                f"feature_data_source_{group}",
+                query,
+                (start, stop),
+            )
+        )
+    return sources
+
+
+def feature_refs(
+    num_features: int,
+    layout: str = "columns",
+    group_size: int = FEATURE_GROUP_SIZE,
+):
+    """
+    The references of every feature, e.g. for get_historical_features.
+    """
+    return [
+        f"{view_name}:col_{i+1}"
+        for view_name, _, _, (start, stop) in feature_sources(
+            "", num_features, layout, group_size
+        )
+        for i in range(start, stop)
+    ]
+
+
+def get_historical_features_df(
+    store: FeatureStore,
+    entity_df,
+    features,
+    full_feature_names: bool = False,
+    max_features: int = MAX_QUERY_FEATURES,
+):
+    """
+    Retrieves historical features as one DataFrame, with one
+    get_historical_features per batch of at most max_features features so
+    no query exceeds Postgres's column cap.
+
+    Parameters:
+    - store: The FeatureStore to read from
+    - entity_df: The entity rows, with example_id and event_timestamp
+    - features: The feature references, e.g. from feature_refs
+    - full_feature_names: Prefix the feature columns with their view names
+    - max_features: Number of features read per query
+
+    The batches are joined on the entity_df columns.
+    """
+    df = None
+    for start in range(0, len(features), max_features):
+        batch_df = store.get_historical_features(
+            entity_df=entity_df,
+            features=features[start : start + max_features],
+            full_feature_names=full_feature_names,
+        ).to_df()
+        if df is None:
+            df = batch_df
+        else:
+            df = df.merge(batch_df, on=list(entity_df.columns), how="inner")
+    return df
+
 
 def setup_feature_store(
     table_name: str = "feature_data",
     num_features: int = 20000,
     ttl: timedelta = timedelta(days=3),
     repo_path: str = ".",
+    layout: str = "columns",
+    group_size: int = FEATURE_GROUP_SIZE,
+    fs_yaml_file: str = None,
 ):
     """
     Sets up the feature store for the 'performance' project using Feast.
@@ -21,9 +158,14 @@ def setup_feature_store(
     - num_features: Number of features to generate
     - ttl: Time to Live for the feature view
     - repo_path: Repository path for the feature store
+    - layout: Table layout generate_data.py loaded the data with; "groups"
+      and "array" get a feature view per group of group_size features
+    - group_size: Number of features per feature view of the wide layouts
+    - fs_yaml_file: Configuration file in repo_path to use instead of
+      feature_store.yaml, such as feature_store_pooled.yaml
 
-    The function configures an entity, features, data source, and feature view,
-    then applies them to the Feast feature store.
+    The function configures an entity, features, data sources, and feature
+    views, then applies them to the Feast feature store.
     """
 
     # Define an entity
@@ -33,30 +175,39 @@ def setup_feature_store(
         description="Example entity for feature view",
     )
 
-    schema = [Field(name=f"col_{i+1}", dtype=Float32) for i in range(num_features)]
+    feature_views = []
+    for view_name, source_name, query, (start, stop) in feature_sources(
+        table_name, num_features, layout, group_size
+    ):
+        schema = [Field(name=f"col_{i+1}", dtype=Float32) for i in range(start, stop)]
 
-    # Define data source
-    feature_data_source = PostgreSQLSource(
-        name="feature_data_source",
-        query=f"SELECT * FROM {table_name}",
-        timestamp_field="event_timestamp",
-    )
+        # Define data source
+        feature_data_source = PostgreSQLSource(
+            name=source_name,
+            query=query,
+            timestamp_field="event_timestamp",
+        )
 
-    # Define a feature view for offline store and online store
-    example_feature_view = FeatureView(
-        name="offline_feature_view",
-        entities=[example_id],
-        schema=schema,
-        online=True,  # Set True for online store to also be created
-        source=feature_data_source,
-        ttl=ttl,
-    )
+        # Define a feature view for offline store and online store
+        feature_views.append(
+            FeatureView(
+                name=view_name,
+                entities=[example_id],
+                schema=schema,
+                online=True,  # Set True for online store to also be created
+                source=feature_data_source,
+                ttl=ttl,
+            )
+        )
 
     # Create a feature store object
-    store = FeatureStore(repo_path=repo_path)
+    store = FeatureStore(
+        repo_path=repo_path,
+        fs_yaml_file=Path(repo_path, fs_yaml_file) if fs_yaml_file else None,
+    )
 
     # Apply the definitions to the feature store
-    store.apply([example_id, example_feature_view])
+    store.apply([example_id, *feature_views])
 
     print(
         f"Applied entity and feature view definitions to the Feast feature store at {store.repo_path}"
@@ -74,4 +225,9 @@ if __name__ == "__main__":
         )
 
     # Call the function with the required parameters
-    setup_feature_store(table_name="perform_large", num_features=500)
+    setup_feature_store(
+        table_name="perform_large",
+        num_features=int(os.getenv("NUM_FEATURES", 500)),
+        layout=os.getenv("FEATURE_LAYOUT", "columns"),
+        fs_yaml_file=os.getenv("FEAST_FS_YAML_FILE"),
+    )
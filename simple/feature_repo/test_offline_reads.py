@@ -1,11 +1,45 @@
 from locust import User, task, between, events, run_single_user
 from feast import FeatureStore
 import os
-import pandas as pd
+from pathlib import Path
+import pyarrow as pa
 import psycopg2
+import psycopg2.pool
+import threading
 import time
 import sys
 
+from setup_featurestore import feature_refs, get_historical_features_df
+
+# Rows fetched per round trip from the server-side entity cursor, each
+# turned into one Arrow record batch.
+ENTITY_BATCH_ROWS = int(os.getenv("ENTITY_BATCH_ROWS", 1024))
+
+# One pool of warm connections shared by every user of this process.  Users
+# borrow a connection per entity read, so PG_POOL_MAX bounds the reads in
+# flight at once rather than the number of users.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connection_pool(offline_store):
+    """Returns the process-wide connection pool to the offline store's
+    database, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = psycopg2.pool.ThreadedConnectionPool(
+                minconn=1,
+                maxconn=int(os.getenv("PG_POOL_MAX", 20)),
+                dbname=offline_store.database,
+                user=offline_store.user,
+                password=offline_store.password,
+                host=offline_store.host,
+                port=offline_store.port,
+            )
+        return _pool
+
+
 # import locust.stats
 
 # locust.stats.CSV_STATS_INTERVAL_SEC = 10  # default is 1 second
@@ -18,64 +52,98 @@ class FeastUser(User):
 
     def on_start(self):
         # Initialize the Feast FeatureStore
-        self.store = FeatureStore(repo_path=os.getenv("FEAST_REPO_PATH", "."))
-        self.num_features = os.getenv("NUM_FEATURES", 500)
-        self.rows = os.getenv("ROWS", 4096)
+        # FEAST_FS_YAML_FILE=feature_store_pooled.yaml connects through pgbouncer
+        repo_path = os.getenv("FEAST_REPO_PATH", ".")
+        fs_yaml_file = os.getenv("FEAST_FS_YAML_FILE")
+        self.store = FeatureStore(
+            repo_path=repo_path,
+            fs_yaml_file=Path(repo_path, fs_yaml_file) if fs_yaml_file else None,
+        )
+        self.num_features = int(os.getenv("NUM_FEATURES", 500))
+        self.rows = int(os.getenv("ROWS", 4096))
         self.feature_view_name = os.getenv("FEATURE_VIEW_NAME", "offline_feature_view")
+        self.layout = os.getenv("FEATURE_LAYOUT", "columns")
 
-    def load_full_dataframe(self, limit=4096):
-        # Retrieve database credentials from env variables
-        user = self.store.config.offline_store.user
-        password = self.store.config.offline_store.password
-        host = self.store.config.offline_store.host
-        port = self.store.config.offline_store.port
-        dbname = self.store.config.offline_store.database
-
-        # Set up the connection string
-        conn_str = f"dbname='{dbname}' user='{user}' host='{host}' password='{password}' port='{port}'"
+        self.pool = connection_pool(self.store.config.offline_store)
 
+    def load_entity_rows(self, limit=4096):
+        """Streams the entity keys and timestamps through a named server-side
+        cursor, ENTITY_BATCH_ROWS rows at a time, into Arrow record batches.
+        Only the entity columns are read, as get_historical_features joins
+        the features itself.  The connection is borrowed from the shared pool
+        for the read only, so users share the warm connections."""
         # Assuming 'perform_large' is the table name where your data is stored
         table_name = os.getenv("TABLE_NAME", "perform_large")
+        if self.layout == "groups":
+            # Every group table holds the same entity rows
+            table_name = f"{table_name}_0"
 
-        # Connect to the database
-        conn = psycopg2.connect(conn_str)
-
-        # Use pandas to load the data into a DataFrame
-        query = (
-            f"SELECT A.example_id, A.event_timestamp, "
-            + ", ".join([f"A.col_{i+1}" for i in range(self.num_features)])
-            + f" FROM {table_name} A LIMIT {limit}"
+        schema = pa.schema(
+            [("example_id", pa.int64()), ("event_timestamp", pa.timestamp("us"))]
         )
-
-        entity_df = pd.read_sql(query, conn)
-
-        # Close the database connection
-        conn.close()
-
-        return entity_df
+        batches = []
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor(name="entity_rows") as cur:
+                cur.itersize = ENTITY_BATCH_ROWS
+                cur.execute(
+                    f"SELECT example_id, event_timestamp FROM {table_name} LIMIT %s",
+                    (limit,),
+                )
+                while True:
+                    rows = cur.fetchmany(ENTITY_BATCH_ROWS)
+                    if not rows:
+                        break
+                    example_ids, event_timestamps = zip(*rows)
+                    batches.append(
+                        pa.record_batch(
+                            [
+                                pa.array(example_ids, pa.int64()),
+                                pa.array(event_timestamps, pa.timestamp("us")),
+                            ],
+                            schema=schema,
+                        )
+                    )
+            # End the read-only transaction the named cursor ran in
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            # Drop the connection rather than reuse it if it broke
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+        return pa.Table.from_batches(batches, schema=schema)
 
     @task
     def get_historical_features(self):
         # Use the feature view name and the names of the columns you want to retrieve
-        features = [
-            f"{self.feature_view_name}:col_{i+1}" for i in range(self.num_features)
-        ]
+        if self.layout == "columns":
+            features = [
+                f"{self.feature_view_name}:col_{i+1}" for i in range(self.num_features)
+            ]
+        else:
+            # The wide layouts have a feature view per group of features
+            features = feature_refs(self.num_features, self.layout)
 
         start_time = time.perf_counter()
-
-        # Load the full dataframe from the 'perform_large' table
-        self.entity_df = self.load_full_dataframe(limit=self.rows)
-
         try:
-            # Retrieve historical features
-            historical_features = self.store.get_historical_features(
-                entity_df=self.entity_df,
-                features=features,
+            # Inside the try, so a failed load is reported as a failed request
+            self.entity_df = self.load_entity_rows(limit=self.rows).to_pandas()
+
+            # Time the feature retrieval only, not loading the entity rows
+            start_time = time.perf_counter()
+
+            # Retrieve historical features, in batches of columns Postgres
+            # can return from one query
+            df = get_historical_features_df(
+                self.store,
+                self.entity_df,
+                features,
                 full_feature_names=True,
             )
 
-            df = historical_features.to_df()
-
             # Log DataFrame info
             data_size = sys.getsizeof(df)
             row_count = len(df)
@@ -1,10 +1,189 @@
-@task
-def online_store_read(self):
-    # Implement a read operation from the online store
-    ...
+from locust import User, task, between, events, run_single_user
+from feast import FeatureStore
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import os
+import random
+import time
 
+from setup_featurestore import feature_refs, feature_sources
 
-@task
-def online_store_write(self):
-    # Implement a write operation to the online store
-    ...
+# Entity rows per get_online_features call; each read picks one of these.
+# Requests are reported under the number of rows they actually sent, which is
+# fewer than the batch size when ROWS is smaller, so every size gets its own
+# statistics.
+ONLINE_BATCH_SIZES = [
+    int(size) for size in os.getenv("ONLINE_BATCH_SIZES", "1,10,100").split(",")
+]
+
+# Rows per write_to_online_store call, and the number of calls a write task
+# issues in parallel.
+WRITE_ROWS = int(os.getenv("WRITE_ROWS", 100))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", 4))
+
+
+READ_REQUEST = "get_online_features"
+WRITE_REQUEST = "write_to_online_store"
+
+# Rows carried by the successful requests of each name, from their context
+rows_sent = defaultdict(int)
+
+
+def read_name(rows):
+    return f"{READ_REQUEST}[{rows}]"
+
+
+def write_name(rows):
+    return f"{WRITE_REQUEST}[{rows}]"
+
+
+class OnlineStoreUser(User):
+    """
+    Reads features of random entities from the online store and writes new
+    feature rows to it.  The features must have been materialized first,
+    e.g. with `feast materialize-incremental`.
+    """
+
+    wait_time = between(1, 1)
+
+    def on_start(self):
+        # FEAST_FS_YAML_FILE=feature_store_pooled.yaml connects through pgbouncer
+        repo_path = os.getenv("FEAST_REPO_PATH", ".")
+        fs_yaml_file = os.getenv("FEAST_FS_YAML_FILE")
+        self.store = FeatureStore(
+            repo_path=repo_path,
+            fs_yaml_file=Path(repo_path, fs_yaml_file) if fs_yaml_file else None,
+        )
+        self.num_features = int(os.getenv("NUM_FEATURES", 500))
+        self.rows = int(os.getenv("ROWS", 4096))
+        self.layout = os.getenv("FEATURE_LAYOUT", "columns")
+        self.features = feature_refs(self.num_features, self.layout)
+
+        # Writes go to the first feature view, which holds every feature of
+        # the "columns" layout and the first group of the wide layouts
+        view_name, _, _, (start, stop) = feature_sources(
+            "", self.num_features, self.layout
+        )[0]
+        self.write_view_name = view_name
+        self.write_columns = [f"col_{i+1}" for i in range(start, stop)]
+        self.executor = ThreadPoolExecutor(max_workers=WRITE_WORKERS)
+
+    def on_stop(self):
+        self.executor.shutdown()
+
+    def fire(self, name, start_time, response_length, rows, exception=None):
+        events.request.fire(
+            request_type="Feast",
+            name=name,
+            response_time=(time.perf_counter() - start_time) * 1000,
+            response_length=response_length,
+            context={"rows": rows},
+            exception=exception,
+        )
+
+    @task
+    def online_store_read(self):
+        batch_size = random.choice(ONLINE_BATCH_SIZES)
+        # example_id runs from 1 to ROWS in the generated data
+        entity_rows = [
+            {"example_id": example_id}
+            for example_id in random.sample(
+                range(1, self.rows + 1), min(batch_size, self.rows)
+            )
+        ]
+
+        start_time = time.perf_counter()
+        try:
+            self.store.get_online_features(
+                features=self.features,
+                entity_rows=entity_rows,
+            ).to_dict()
+        except Exception as e:
+            self.fire(read_name(len(entity_rows)), start_time, 0, 0, e)
+            return
+        # Four bytes per float32 feature value
+        self.fire(
+            read_name(len(entity_rows)),
+            start_time,
+            len(self.features) * len(entity_rows) * 4,
+            len(entity_rows),
+        )
+
+    def write_rows(self, df):
+        start_time = time.perf_counter()
+        try:
+            self.store.write_to_online_store(self.write_view_name, df)
+        except Exception as e:
+            self.fire(write_name(len(df)), start_time, 0, 0, e)
+            return
+        self.fire(write_name(len(df)), start_time, df.memory_usage().sum(), len(df))
+
+    @task
+    def online_store_write(self):
+        # WRITE_WORKERS batches of WRITE_ROWS disjoint random entities, each
+        # in ascending order: concurrent upserts of overlapping rows lock them
+        # in the same order, rather than deadlocking each other
+        example_ids = random.sample(
+            range(1, self.rows + 1), min(WRITE_ROWS * WRITE_WORKERS, self.rows)
+        )
+        df = pd.DataFrame(
+            np.random.rand(len(example_ids), len(self.write_columns)).astype(
+                np.float32
+            ),
+            columns=self.write_columns,
+        )
+        df.insert(0, "example_id", example_ids)
+        df.insert(1, "event_timestamp", datetime.now(timezone.utc))
+
+        batches = [
+            df[i : i + WRITE_ROWS].sort_values("example_id")
+            for i in range(0, len(df), WRITE_ROWS)
+        ]
+        list(self.executor.map(self.write_rows, batches))
+
+
+@events.request.add_listener
+def count_rows(name, context, exception, **kwargs):
+    if exception is None and "rows" in (context or {}):
+        rows_sent[name] += context["rows"]
+
+
+@events.test_stop.add_listener
+def report_batch_sizes(environment, **kwargs):
+    """Prints the latency percentiles and throughput of every batch size,
+    counting the rows the successful requests reported in their context."""
+    entries = [
+        stats
+        for (name, method), stats in environment.stats.entries.items()
+        if method == "Feast"
+        and name.startswith((READ_REQUEST + "[", WRITE_REQUEST + "["))
+        and stats.num_requests
+    ]
+    # Reads before writes, smallest batches first
+    entries.sort(
+        key=lambda stats: (
+            not stats.name.startswith(READ_REQUEST),
+            rows_sent[stats.name] / stats.num_requests,
+        )
+    )
+    print(
+        f"{'Request':<32} {'Count':>8} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'req/s':>8} {'rows/s':>10}"
+    )
+    for stats in entries:
+        # Rows over the same period total_rps counts requests over
+        rows_per_second = stats.total_rps * rows_sent[stats.name] / stats.num_requests
+        print(
+            f"{stats.name:<32} {stats.num_requests:>8} "
+            f"{stats.get_response_time_percentile(0.5):>8} "
+            f"{stats.get_response_time_percentile(0.99):>8} "
+            f"{stats.total_rps:>8.1f} {rows_per_second:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    run_single_user(OnlineStoreUser)